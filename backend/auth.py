@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+# Tokens grant access to every project and asset of their subject, so a
+# known signing key means full access; there is no default.
+SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+if not SECRET_KEY:
+    raise RuntimeError("JWT_SECRET_KEY is not set; refusing to start with a guessable token signing key")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "50000"))
+# OAuth client id the Google ID tokens must be issued for; /auth/google is off without it
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: str
+    email: Optional[str] = None
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+class TokenCache:
+    """Decoded claims keyed by the SHA-256 of the token. A hit costs one hash
+    instead of an HMAC check plus JSON decode; entries die at the token's exp.
+    Only tokens that verified are stored, so bad tokens cannot evict good ones."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, CurrentUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, exp: float, user: CurrentUser) -> None:
+        with self._lock:
+            self._entries[key] = (exp, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+token_cache = TokenCache()
+
+def decode_token(token: str) -> CurrentUser:
+    key = hashlib.sha256(token.encode()).digest()
+    user = token_cache.get(key)
+    if user is not None:
+        return user
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    if not claims.get("sub") or "exp" not in claims:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    user = CurrentUser(id=str(claims["sub"]), email=claims.get("email"))
+    token_cache.put(key, float(claims["exp"]), user)
+    return user
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> CurrentUser:
+    # Claims carry everything the handlers need; no user lookup per request
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return decode_token(credentials.credentials)
+
+def check_owner(user: CurrentUser, owner_id: Optional[str]) -> str:
+    # owner_id params predate token auth; they may only name the caller
+    if owner_id and owner_id != user.id:
+        raise HTTPException(status_code=403, detail="owner_id does not match the authenticated user")
+    return user.id
+
+def _verify_google(token: str) -> dict:
+    # Imported lazily: only deployments with Google sign-in need the transport
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+    return id_token.verify_oauth2_token(token, google_requests.Request(), GOOGLE_CLIENT_ID)
+
+async def verify_google_id_token(token: str) -> str:
+    """Checks signature, audience, issuer and expiry of a Google ID token and
+    returns its verified email. Fetching Google's certs blocks, so it runs in
+    a thread."""
+    if not GOOGLE_CLIENT_ID:
+        raise HTTPException(status_code=503, detail="Google sign-in is not configured")
+    try:
+        claims = await asyncio.to_thread(_verify_google, token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid Google ID token")
+    if not claims.get("email") or not claims.get("email_verified"):
+        raise HTTPException(status_code=401, detail="Google account email is not verified")
+    return claims["email"]
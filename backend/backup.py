@@ -0,0 +1,116 @@
+import asyncio
+import base64
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from database import InvalidCursor, get_db, to_public
+from serialization import orjson
+from slides import is_external, slides_by_project
+
+# Full export of one user's data as NDJSON: projects, then media assets, each
+# walked in _id order with a server-side cursor. Lines use the same shape as
+# POST /import input, so a backup can be imported again as-is. Every line
+# carries a cursor naming its position; passing the last one received resumes
+# the export right after it. Memory is bounded by one cursor batch.
+
+BACKUP_BATCH_SIZE = int(os.getenv("BACKUP_BATCH_SIZE", "500"))
+BACKUP_CHUNK_BYTES = int(os.getenv("BACKUP_CHUNK_BYTES", str(64 * 1024)))
+BACKUP_GZIP_LEVEL = int(os.getenv("BACKUP_GZIP_LEVEL", "6"))
+
+# (kind, collection) in export order
+SECTIONS = (("project", "project"), ("media", "mediaasset"))
+# Storage bookkeeping that the import rebuilds on its own
+_INTERNAL = ("slide_storage", "slide_count")
+
+def encode_position(section: int, last_id: ObjectId) -> str:
+    raw = f"{SECTIONS[section][0]}:{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_position(token: str) -> Tuple[int, ObjectId]:
+    try:
+        kind, last_id = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split(":")
+        section = [k for k, _ in SECTIONS].index(kind)
+        return section, ObjectId(last_id)
+    except (ValueError, InvalidId) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+def _default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def _line(item: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(item, default=str, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(item, default=_default, separators=(",", ":")).encode() + b"\n"
+
+async def _batches(collection: str, owner_id: str, after: Optional[ObjectId], batch_size: int) -> AsyncIterator[List[dict]]:
+    # Groups what the driver fetches per getMore, so per-batch work (slide
+    # lookups) costs one query per batch rather than one per document
+    db = await get_db()
+    filt: Dict[str, object] = {"owner_id": owner_id}
+    if after is not None:
+        filt["_id"] = {"$gt": after}
+    cursor = db[collection].find(filt).sort("_id", 1).batch_size(batch_size)
+    batch: List[dict] = []
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        await cursor.close()
+
+async def _attach_slides(projects: List[dict]) -> None:
+    # Collection-mode projects get their slides back inline, in order
+    external = [str(p["_id"]) for p in projects if is_external(p)]
+    if not external:
+        return
+    slides = await slides_by_project(external)
+    for proj in projects:
+        if is_external(proj):
+            proj["slides"] = slides[str(proj["_id"])]
+
+async def _lines(owner_id: str, section: int, after: Optional[ObjectId], batch_size: int) -> AsyncIterator[bytes]:
+    for index in range(section, len(SECTIONS)):
+        kind, collection = SECTIONS[index]
+        async for batch in _batches(collection, owner_id, after, batch_size):
+            if kind == "project":
+                await _attach_slides(batch)
+            for doc in batch:
+                cursor = encode_position(index, doc["_id"])
+                for key in _INTERNAL:
+                    doc.pop(key, None)
+                yield _line({"kind": kind, "cursor": cursor, **to_public(doc)})
+        after = None
+
+async def iter_backup(owner_id: str, cursor: Optional[str] = None, compress: bool = False, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    section, after = decode_position(cursor) if cursor else (0, None)
+    # gzip container (wbits 31); a resumed export is a new gzip member, and
+    # concatenated members decompress as one stream
+    compressor = zlib.compressobj(BACKUP_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    chunk: List[bytes] = []
+    size = 0
+    async for line in _lines(owner_id, section, after, batch_size or BACKUP_BATCH_SIZE):
+        chunk.append(line)
+        size += len(line)
+        if size < BACKUP_CHUNK_BYTES:
+            continue
+        data, chunk, size = b"".join(chunk), [], 0
+        if compressor is not None:
+            # zlib releases the GIL; compress beside the loop, not on it
+            data = await asyncio.to_thread(compressor.compress, data)
+        if data:
+            yield data
+    data = b"".join(chunk)
+    if compressor is not None:
+        data = await asyncio.to_thread(lambda: compressor.compress(data) + compressor.flush())
+    if data:
+        yield data
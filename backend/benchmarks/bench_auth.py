@@ -0,0 +1,63 @@
+"""Per-request cost of Bearer token authentication.
+
+Times a bare route against the same route behind get_current_user, with the
+decoded-claims cache warm (every request reuses a token) and cold (a fresh
+token per request, so each one pays the HMAC check and JSON decode). The
+core_pct column is the CPU share that overhead would take at the target
+rate on one worker.
+
+    cd backend && python -m benchmarks.bench_auth [requests] [target_rps]
+"""
+import asyncio
+import sys
+import time
+
+from fastapi import Depends, FastAPI
+
+from benchmarks.common import asgi_get, print_table, summarize
+
+import auth  # noqa: E402
+
+app = FastAPI()
+
+@app.get("/open")
+async def open_route():
+    return {"ok": True}
+
+@app.get("/authed")
+async def authed_route(user: auth.CurrentUser = Depends(auth.get_current_user)):
+    return {"ok": True}
+
+async def time_requests(path, tokens):
+    samples = []
+    for token in tokens:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        t0 = time.perf_counter()
+        status, _ = await asgi_get(app, path, headers=headers)
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert status == 200, status
+    return samples
+
+async def run(requests, target_rps):
+    token = auth.create_access_token({"sub": "bench", "email": "bench@example.com"})
+    fresh = [auth.create_access_token({"sub": f"user{i}", "email": f"user{i}@example.com"}) for i in range(requests)]
+    await time_requests("/open", [None] * 200)  # warm up routing
+
+    baseline = await time_requests("/open", [None] * requests)
+    cases = [("no auth", baseline), ("auth, cached", await time_requests("/authed", [token] * requests))]
+    auth.token_cache = auth.TokenCache()
+    cases.append(("auth, uncached", await time_requests("/authed", fresh)))
+
+    base_mean = sum(baseline) / len(baseline)
+    rows = []
+    for label, samples in cases:
+        overhead_ms = max(0.0, sum(samples) / len(samples) - base_mean)
+        rows.append({
+            "case": label, **summarize(samples),
+            "overhead_us": round(overhead_ms * 1000, 1),
+            "core_pct": round(overhead_ms * target_rps / 10, 2),
+        })
+    print_table(f"Auth overhead per request at {target_rps} RPS", rows)
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 5000))
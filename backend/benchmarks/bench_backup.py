@@ -0,0 +1,57 @@
+"""Backup export throughput and peak memory by dataset size.
+
+Needs a reachable mongod (DATABASE_URL / DATABASE_NAME). Seeds a user with
+generated projects and media through the import pipeline, then drains
+iter_backup plain and gzipped. Peak traced memory should stay flat as the
+dataset grows, since only one cursor batch is held at a time.
+
+    cd backend && python -m benchmarks.bench_backup [documents]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import print_table
+from benchmarks.bench_import import chunks, make_body
+
+import database  # noqa: E402
+from backup import iter_backup  # noqa: E402
+from importer import iter_ndjson, run_import  # noqa: E402
+
+OWNER = "bench-backup"
+
+async def cleanup():
+    db = await database.get_db()
+    await db["project"].delete_many({"owner_id": OWNER})
+    await db["mediaasset"].delete_many({"owner_id": OWNER})
+
+async def seed(n: int):
+    async for _ in run_import(iter_ndjson(chunks(make_body(n))), OWNER, errors_only=True, batch_size=5000):
+        pass
+
+async def drain(compress: bool):
+    size = 0
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    async for chunk in iter_backup(OWNER, compress=compress):
+        size += len(chunk)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+async def run(n: int):
+    rows = []
+    for docs in (n // 4, n):
+        await cleanup()
+        await seed(docs)
+        for compress in (False, True):
+            elapsed, size, peak = await drain(compress)
+            rows.append({"docs": docs, "gzip": compress, "seconds": round(elapsed, 3), "docs_per_s": int(docs / elapsed),
+                         "mb_out": round(size / 1e6, 2), "peak_mb": round(peak / 1e6, 2)})
+    await cleanup()
+    print_table("Backup export", rows)
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
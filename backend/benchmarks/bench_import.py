@@ -0,0 +1,74 @@
+"""Bulk import throughput (documents/second) by batch size.
+
+Needs a reachable mongod (DATABASE_URL / DATABASE_NAME). Feeds generated
+NDJSON through the same parse -> validate -> insert_many pipeline as
+POST /import, in 64 KiB chunks as a client upload would arrive, and also
+times parsing and validation alone to show how much of the budget is Python.
+
+    cd backend && python -m benchmarks.bench_import [documents]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import print_table
+
+import database  # noqa: E402
+from importer import _validate_batch, iter_ndjson, run_import  # noqa: E402
+
+OWNER = "bench-import"
+CHUNK = 64 * 1024
+
+def make_body(n: int) -> bytes:
+    lines = []
+    for i in range(n):
+        kind = "media" if i % 4 == 3 else "project"
+        if kind == "project":
+            item = {"kind": kind, "title": f"Imported {i}", "date": "2026-10-16", "platform": "tiktok",
+                    "slides": [{"bg": "#111827", "color": "#ffffff", "text": f"Slide {n}"} for n in range(5)]}
+        else:
+            item = {"kind": kind, "url": f"https://old.example.com/{i}.png", "type": "image", "name": f"{i}.png"}
+        lines.append(json.dumps(item))
+    return ("\n".join(lines) + "\n").encode()
+
+async def chunks(body: bytes):
+    for i in range(0, len(body), CHUNK):
+        yield body[i:i + CHUNK]
+
+async def cleanup():
+    db = await database.get_db()
+    await db["project"].delete_many({"owner_id": OWNER})
+    await db["mediaasset"].delete_many({"owner_id": OWNER})
+
+async def run(n: int):
+    body = make_body(n)
+    rows = []
+
+    t0 = time.perf_counter()
+    items = [(i, item) async for i, item in _enumerate(iter_ndjson(chunks(body)))]
+    for start in range(0, len(items), 1000):
+        _validate_batch(items[start:start + 1000], OWNER)
+    elapsed = time.perf_counter() - t0
+    rows.append({"stage": "parse+validate", "batch_size": 1000, "docs": n, "seconds": round(elapsed, 3), "docs_per_s": int(n / elapsed)})
+
+    for batch_size in (250, 1000, 5000):
+        await cleanup()
+        t0 = time.perf_counter()
+        last = None
+        async for line in run_import(iter_ndjson(chunks(body)), OWNER, errors_only=True, batch_size=batch_size):
+            last = json.loads(line)
+        elapsed = time.perf_counter() - t0
+        assert last["inserted"] == n, last
+        rows.append({"stage": "end to end", "batch_size": batch_size, "docs": n, "seconds": round(elapsed, 3), "docs_per_s": int(n / elapsed)})
+    await cleanup()
+    print_table("Bulk import", rows)
+
+async def _enumerate(aiter):
+    i = 0
+    async for item in aiter:
+        yield i, item
+        i += 1
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
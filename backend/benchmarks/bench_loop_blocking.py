@@ -0,0 +1,86 @@
+"""Event-loop blocking by the root database helpers, before and after the
+move to async.
+
+Needs a reachable mongod (DATABASE_URL / DATABASE_NAME). Concurrent tasks
+stand in for request handlers, each inserting a document and reading a few
+back. A heartbeat task asks to wake every millisecond; how late it wakes is
+how long the loop was blocked. "before" calls synchronous PyMongo helpers
+the way the old module did, "after" awaits the current async ones.
+
+    cd backend && python -m benchmarks.bench_loop_blocking [tasks] [ops_per_task]
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import percentile, print_table
+
+import database  # noqa: E402
+
+# The root module is also named database; load it under another name
+os.environ.setdefault("DATABASE_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", database.DB_NAME)
+_spec = importlib.util.spec_from_file_location("root_database", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "database.py"))
+root_database = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(root_database)
+
+COLLECTION = "bench_loop_blocking"
+TICK = 0.001
+
+# Old root helpers: a synchronous client, one blocking round trip per call
+_sync_db = root_database.db.delegate
+
+async def legacy_create_document(collection_name, data):
+    data_dict = data.copy()
+    data_dict['created_at'] = datetime.now(timezone.utc)
+    data_dict['updated_at'] = datetime.now(timezone.utc)
+    return str(_sync_db[collection_name].insert_one(data_dict).inserted_id)
+
+async def legacy_get_documents(collection_name, filter_dict=None, limit=None):
+    cursor = _sync_db[collection_name].find(filter_dict or {})
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+VARIANTS = {
+    "before": (legacy_create_document, legacy_get_documents),
+    "after": (root_database.create_document, root_database.get_documents),
+}
+
+async def heartbeat(lags, stop):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - t0 - TICK))
+
+async def handler(create, read, n):
+    for i in range(n):
+        await create(COLLECTION, {"n": i, "payload": "x" * 200})
+        await read(COLLECTION, {"n": i}, 5)
+
+async def run(tasks: int, ops: int):
+    rows = []
+    for name, (create, read) in VARIANTS.items():
+        await root_database.db[COLLECTION].delete_many({})
+        lags, stop = [], asyncio.Event()
+        beat = asyncio.create_task(heartbeat(lags, stop))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(handler(create, read, ops) for _ in range(tasks)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await beat
+        rows.append({
+            "variant": name, "tasks": tasks, "ops": tasks * ops * 2,
+            "ops_per_s": int(tasks * ops * 2 / elapsed),
+            "lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+            "lag_max_ms": round(max(lags, default=0.0) * 1000, 2),
+            "blocked_pct": round(100 * sum(lags) / elapsed, 1),
+        })
+    await root_database.db[COLLECTION].drop()
+    print_table("Event-loop blocking by root database helpers", rows)
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50, int(sys.argv[2]) if len(sys.argv) > 2 else 40))
@@ -0,0 +1,51 @@
+"""PPTX export of a 500-slide deck: python-pptx per call vs the template engine.
+
+Reports a cold run (first call in the process, template parse included) and
+warm runs. No database needed.
+
+    cd backend && python -m benchmarks.bench_pptx [slides] [iterations]
+"""
+import io
+import sys
+import time
+
+from pptx import Presentation
+from pptx.util import Inches
+
+from benchmarks.common import print_table, summarize
+
+import pptx_engine  # noqa: E402
+
+def legacy_build_pptx(slides):
+    prs = Presentation()
+    for idx, s in enumerate(slides, start=1):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        txBox = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(8), Inches(5))
+        tf = txBox.text_frame
+        tf.text = s.get('text', f'Slide {idx}')
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+def engine_build_pptx(slides):
+    return b"".join(pptx_engine.iter_pptx(slides))
+
+def run(n, iterations):
+    slides = [{"text": f"Slide {i}: doors open, stage call, headliner"} for i in range(n)]
+    rows = []
+    for label, build in (("before (python-pptx)", legacy_build_pptx), ("after (template engine)", engine_build_pptx)):
+        t0 = time.perf_counter()
+        size = len(build(slides))
+        cold = (time.perf_counter() - t0) * 1000
+        samples = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            build(slides)
+            samples.append((time.perf_counter() - t0) * 1000)
+        rows.append({"impl": label, "slides": n, "cold_ms": round(cold, 1), **summarize(samples), "size_kb": size // 1024})
+    print_table("PPTX export", rows)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(n, iterations)
@@ -0,0 +1,70 @@
+"""Wall time and CPU per core for the 'images' export of a 200-slide project.
+
+Compares the old single-loop render (ZIP_DEFLATED) with export_images_zip on
+a process pool (ZIP_STORED). No database needed.
+
+    cd backend && python -m benchmarks.bench_render [slides] [workers]
+"""
+import asyncio
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from benchmarks.common import print_table
+
+from exports import export_images_zip  # noqa: E402
+from render import render_png  # noqa: E402
+
+def cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+def make_slides(n):
+    return [{"bg": f"#{(i * 2654435761) & 0xFFFFFF:06x}", "color": "#ffffff", "text": f"Slide {i} - venue walkthrough"} for i in range(n)]
+
+def sequential(slides, path):
+    buf = io.BytesIO()
+    with ZipFile(buf, 'w', ZIP_DEFLATED) as zipf:
+        for idx, s in enumerate(slides, start=1):
+            zipf.writestr(f'slide_{idx}.png', render_png(s, idx))
+    with open(path, "wb") as f:
+        f.write(buf.getvalue())
+
+def run(n, workers):
+    slides = make_slides(n)
+    cores = os.cpu_count() or 1
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("sequential", "process pool"):
+            path = os.path.join(tmp, f"{label}.zip")
+            cpu0, t0 = cpu_seconds(), time.perf_counter()
+            if label == "sequential":
+                sequential(slides, path)
+            else:
+                # Pool shutdown reaps the workers so their CPU time is counted
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    asyncio.run(export_images_zip(pool, slides, path))
+            wall = time.perf_counter() - t0
+            cpu = cpu_seconds() - cpu0
+            rows.append({
+                "impl": label,
+                "slides": n,
+                "wall_s": round(wall, 2),
+                "cpu_s": round(cpu, 2),
+                "cpu_per_core_pct": round(100 * cpu / wall / cores, 1),
+                "zip_mb": round(os.path.getsize(path) / 1e6, 2),
+            })
+    print_table(f"images export ({cores} cores, {workers} workers)", rows)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    run(n, workers)
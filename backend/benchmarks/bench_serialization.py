@@ -0,0 +1,76 @@
+"""Serialization cost per endpoint for 1, 100 and 1000 projects.
+
+The database helpers are replaced with in-memory documents so only handler,
+validation and encoding time is measured. Compares the default path
+(Pydantic models + response_model validation) with TRUST_DB_OUTPUT.
+
+    cd backend && python -m benchmarks.bench_serialization [iterations]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from benchmarks.common import asgi_get, print_table, summarize
+
+import main  # noqa: E402
+from auth import create_access_token  # noqa: E402
+import serialization  # noqa: E402
+
+def make_project(i):
+    now = datetime.utcnow()
+    return {
+        "id": str(ObjectId()), "owner_id": "bench", "title": f"Storyboard {i}", "date": "2026-10-16",
+        "location": "Main hall", "platform": "tiktok", "mood": "upbeat", "theme_id": None,
+        "slides": [{"bg": "#111827", "color": "#ffffff", "text": f"Slide {n}"} for n in range(12)],
+        "collaborators": ["a", "b"], "created_at": now, "updated_at": now,
+    }
+
+def make_asset(i):
+    return {"id": str(ObjectId()), "owner_id": "bench", "project_id": None, "url": f"uploads/{i}", "type": "image", "name": f"{i}.png", "created_at": datetime.utcnow()}
+
+async def measure(n, iterations):
+    projects = [make_project(i) for i in range(n)]
+    assets = [make_asset(i) for i in range(n)]
+
+    async def fake_get_page(collection_name, *args, **kwargs):
+        return (projects if collection_name == "project" else assets), None
+
+    async def fake_get_document(collection_name, filter_dict):
+        return projects[0]
+
+    main.get_page = fake_get_page
+    main.get_document = fake_get_document
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    endpoints = [
+        ("GET /projects", "/projects", f"limit={min(n, 500)}"),
+        ("GET /media", "/media", f"limit={min(n, 500)}"),
+        ("GET /projects/{id}", f"/projects/{projects[0]['id']}", ""),
+    ]
+    rows = []
+    for trusted in (False, True):
+        serialization.TRUST_DB_OUTPUT = trusted
+        for label, path, query in endpoints:
+            if label == "GET /projects/{id}" and n > 1:
+                continue
+            samples = []
+            for _ in range(iterations):
+                # Measure the cold path, not the response cache
+                await main.project_cache.invalidate(f"project:{projects[0]['id']}")
+                t0 = time.perf_counter()
+                status, body = await asgi_get(main.app, path, query, headers)
+                samples.append((time.perf_counter() - t0) * 1000)
+            assert status == 200, (label, status, body[:200])
+            rows.append({"mode": "trusted" if trusted else "validated", "endpoint": label, "items": n, "bytes": len(body), **summarize(samples)})
+    return rows
+
+async def run(iterations):
+    rows = []
+    for n in (1, 100, 1000):
+        rows.extend(await measure(n, iterations))
+    print_table(f"Serialization ({'orjson' if serialization.orjson else 'json'})", rows)
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,95 @@
+"""Round trips and latency for POST /projects and PUT /projects/{id}.
+
+Needs a reachable mongod (DATABASE_URL / DATABASE_NAME). Compares the old
+insert+find_one / update_one+find_one helpers against the current
+single-round-trip helpers by calling the route handlers directly.
+
+    cd backend && python -m benchmarks.bench_writes [iterations]
+"""
+import asyncio
+import sys
+import time
+
+from pymongo import monitoring
+
+from benchmarks.common import print_table, summarize
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+counter = RoundTripCounter()
+monitoring.register(counter)
+
+import database  # noqa: E402
+import main  # noqa: E402
+from auth import CurrentUser  # noqa: E402
+from schemas import Project  # noqa: E402
+
+USER = CurrentUser(id="bench")
+
+async def legacy_create_document(collection_name, data):
+    db = await database.get_db()
+    res = await db[collection_name].insert_one(data)
+    doc = await db[collection_name].find_one({"_id": res.inserted_id})
+    if doc:
+        doc["id"] = str(doc.pop("_id"))
+    return doc or {}
+
+async def legacy_update_document(collection_name, filter_dict, data, inc=None):
+    db = await database.get_db()
+    await db[collection_name].update_one(database.to_filter(filter_dict), {"$set": data, **({"$inc": inc} if inc else {})})
+    return await database.get_document(collection_name, filter_dict)
+
+IMPLEMENTATIONS = {
+    "before": (legacy_create_document, legacy_update_document),
+    "after": (database.create_document, database.update_document),
+}
+
+def sample_project() -> Project:
+    slides = [{"bg": "#111827", "color": "#ffffff", "text": f"Slide {i}"} for i in range(20)]
+    return Project(owner_id="bench", title="Benchmark storyboard", slides=slides)
+
+async def measure(label, iterations):
+    create, update = IMPLEMENTATIONS[label]
+    main.create_document, main.update_document = create, update
+    rows = []
+    created = []
+
+    samples, start_count = [], counter.count
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        created.append(await main.create_project(sample_project(), USER))
+        samples.append((time.perf_counter() - t0) * 1000)
+    rows.append({"impl": label, "endpoint": "POST /projects", "round_trips": (counter.count - start_count) / iterations, **summarize(samples)})
+
+    samples, start_count = [], counter.count
+    for proj in created:
+        t0 = time.perf_counter()
+        try:
+            await main.update_project(proj.id, sample_project(), USER)
+        except main.HTTPException:
+            pass
+        samples.append((time.perf_counter() - t0) * 1000)
+    rows.append({"impl": label, "endpoint": "PUT /projects/{id}", "round_trips": (counter.count - start_count) / iterations, **summarize(samples)})
+    return rows
+
+async def run(iterations):
+    db = await database.get_db()
+    rows = []
+    for label in IMPLEMENTATIONS:
+        rows.extend(await measure(label, iterations))
+    await db["project"].delete_many({"owner_id": "bench"})
+    print_table("Project writes", rows)
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,54 @@
+import os
+import sys
+from typing import Dict, List
+
+# Benchmarks run from the backend directory: python -m benchmarks.<name>
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# auth refuses to import without a signing key; benchmarks mint their own tokens
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-key")
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.50), 3),
+        "p99_ms": round(percentile(samples_ms, 0.99), 3),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+def print_table(title: str, rows: List[Dict[str, object]]) -> None:
+    print(f"\n== {title} ==")
+    if not rows:
+        return
+    cols = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in cols))
+
+async def asgi_get(app, path: str, query: str = "", headers: Dict[str, str] = None):
+    """Minimal in-process ASGI GET: returns (status, body) without a server
+    or an HTTP client dependency."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body
@@ -1,51 +1,197 @@
 import os
-from typing import Any, Dict, List, Optional
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import json
+import asyncio
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from schemas import INDEXES, HOT_QUERIES
+from metrics import pool_stats
+from mongo import MONGO_MIN_POOL_SIZE, close_client, get_client
+
+logger = logging.getLogger(__name__)
 
-MONGO_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DATABASE_NAME", "event_storyboard")
+INDEX_SELF_CHECK = os.getenv("INDEX_SELF_CHECK", "1") == "1"
 
-_client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
 
 async def get_db() -> AsyncIOMotorDatabase:
-    global _client, _db
+    # Lazy for scripts and benchmarks; the app opens it in connect_db at startup
+    global _db
     if _db is None:
-        _client = AsyncIOMotorClient(MONGO_URL)
-        _db = _client[DB_NAME]
+        _db = get_client()[DB_NAME]
     return _db
 
+async def connect_db() -> None:
+    # The driver fills minPoolSize in the background; checking out that many
+    # connections at once opens them now so the first requests don't pay the
+    # TCP/TLS and handshake cost.
+    db = await get_db()
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+    logger.info("Mongo pool ready: %s", pool_stats.stats())
+
+def close_db() -> None:
+    global _db
+    close_client()
+    _db = None
+
+# Public ids are the hex string of the document's ObjectId _id. Callers filter
+# with {"id": ...}; these helpers map that onto the primary-key index.
+def to_object_id(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return ObjectId(value)
+        except InvalidId:
+            return value
+    return value
+
+def to_filter(filter_dict: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    filt = dict(filter_dict or {})
+    if "id" in filt:
+        value = filt.pop("id")
+        if isinstance(value, dict):
+            value = {op: [to_object_id(v) for v in arg] if isinstance(arg, list) else to_object_id(arg) for op, arg in value.items()}
+        else:
+            value = to_object_id(value)
+        filt["_id"] = value
+    return filt
+
+def to_storage(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Never persist the public id; it is always derived from _id
+    return {k: v for k, v in data.items() if k not in ("id", "_id")}
+
+def to_public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
 async def create_document(collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
     db = await get_db()
-    res = await db[collection_name].insert_one(data)
-    doc = await db[collection_name].find_one({"_id": res.inserted_id})
-    if doc:
-        doc["id"] = str(doc.pop("_id"))
-    return doc or {}
+    # insert_one assigns the generated _id in place, so the inserted document
+    # can be returned as-is without a second round trip.
+    doc = to_storage(data)
+    res = await db[collection_name].insert_one(doc)
+    doc.pop("_id", None)
+    doc["id"] = str(res.inserted_id)
+    return doc
 
 async def get_documents(collection_name: str, filter_dict: Optional[Dict[str, Any]] = None, limit: int = 100) -> List[Dict[str, Any]]:
     db = await get_db()
-    cursor = db[collection_name].find(filter_dict or {}).limit(limit)
-    results: List[Dict[str, Any]] = []
-    async for doc in cursor:
-        doc["id"] = str(doc.pop("_id"))
-        results.append(doc)
-    return results
+    cursor = db[collection_name].find(to_filter(filter_dict)).limit(limit)
+    return [to_public(doc) async for doc in cursor]
+
+class InvalidCursor(ValueError):
+    pass
+
+# Keyset pagination: results are sorted newest-first on (sort_field, _id) and
+# the opaque cursor carries the last returned key, so every page is an index
+# range scan no matter how deep the client pages. direction=1 pages oldest-
+# (or lowest-) first instead.
+def encode_cursor(doc: Dict[str, Any], sort_field: str = "_id") -> str:
+    payload: Dict[str, Any] = {"id": str(doc["_id"])}
+    if sort_field != "_id":
+        value = doc.get(sort_field)
+        if isinstance(value, datetime):
+            payload["dt"] = True
+            value = value.isoformat()
+        payload["v"] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str, sort_field: str = "_id", direction: int = -1) -> Dict[str, Any]:
+    op = "$lt" if direction < 0 else "$gt"
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        last_id = ObjectId(payload["id"])
+        if sort_field == "_id":
+            return {"_id": {op: last_id}}
+        value = payload.get("v")
+        if payload.get("dt"):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    return {"$or": [{sort_field: {op: value}}, {sort_field: value, "_id": {op: last_id}}]}
+
+async def get_page(collection_name: str, filter_dict: Optional[Dict[str, Any]] = None, limit: int = 50, cursor: Optional[str] = None, sort_field: str = "_id", projection: Optional[Dict[str, Any]] = None, direction: int = -1) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    db = await get_db()
+    filt = to_filter(filter_dict)
+    if cursor:
+        after = decode_cursor(cursor, sort_field, direction)
+        filt = {"$and": [filt, after]} if filt else after
+    sort = [("_id", direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+    if projection is not None:
+        # The sort key must come back to build the next cursor
+        projection = {**projection, sort_field: 1}
+    # Fetch one extra document to know whether another page exists
+    docs = await db[collection_name].find(filt, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+    return [to_public(doc) for doc in docs[:limit]], next_cursor
 
-async def get_document(collection_name: str, filter_dict: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def get_document(collection_name: str, filter_dict: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     db = await get_db()
-    doc = await db[collection_name].find_one(filter_dict)
-    if not doc:
-        return None
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+    doc = await db[collection_name].find_one(to_filter(filter_dict), projection)
+    return to_public(doc) if doc else None
+
+async def aggregate_one(collection_name: str, pipeline: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    db = await get_db()
+    docs = await db[collection_name].aggregate(pipeline + [{"$limit": 1}]).to_list(length=1)
+    return to_public(docs[0]) if docs else None
 
-async def update_document(collection_name: str, filter_dict: Dict[str, Any], data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def update_document(collection_name: str, filter_dict: Dict[str, Any], data: Dict[str, Any], inc: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    update = {"$set": to_storage(data)}
+    if inc:
+        update["$inc"] = inc
+    return await apply_update(collection_name, filter_dict, update)
+
+async def apply_update(collection_name: str, filter_dict: Dict[str, Any], update: Any, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    # Raw update document or pipeline; returns the matched document after the update
     db = await get_db()
-    await db[collection_name].update_one(filter_dict, {"$set": data})
-    return await get_document(collection_name, filter_dict)
+    doc = await db[collection_name].find_one_and_update(to_filter(filter_dict), update, projection=projection, return_document=ReturnDocument.AFTER)
+    return to_public(doc) if doc else None
 
 async def delete_document(collection_name: str, filter_dict: Dict[str, Any]) -> bool:
     db = await get_db()
-    res = await db[collection_name].delete_one(filter_dict)
+    res = await db[collection_name].delete_one(to_filter(filter_dict))
     return res.deleted_count == 1
+
+async def ensure_indexes() -> None:
+    # create_indexes is a no-op for indexes that already exist with the same spec
+    db = await get_db()
+    for collection_name, indexes in INDEXES.items():
+        try:
+            names = await db[collection_name].create_indexes(indexes)
+        except DuplicateKeyError:
+            logger.error("Unique index on %s can't be built over duplicate values; see schemas.INDEXES for the cleanup", collection_name)
+            raise
+        logger.info("Indexes ready on %s: %s", collection_name, ", ".join(names))
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def check_query_plans() -> None:
+    db = await get_db()
+    scans = []
+    for collection_name, filter_dict in HOT_QUERIES:
+        explained = await db[collection_name].find(to_filter(filter_dict)).explain()
+        winning = explained.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning):
+            scans.append(f"{collection_name} {sorted(filter_dict)}")
+    if scans:
+        raise RuntimeError("Hot queries fall back to COLLSCAN: " + "; ".join(scans))
+
+async def init_indexes() -> None:
+    await ensure_indexes()
+    if INDEX_SELF_CHECK:
+        await check_query_plans()
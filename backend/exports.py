@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from zipfile import ZipFile, ZIP_STORED
+
+from pymongo import ReturnDocument
+
+from database import create_document, get_db, get_document, to_public, update_document
+from pptx_engine import get_template, write_pptx
+from render import CANVAS_SIZE, render_png_batch, render_raw_batch
+from schemas import ExportJob
+from slide_cache import SlideCache, get_slide_cache, slide_key
+from slides import slide_list, slide_source, slide_total
+from zipstream import ZipSink
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ROOT = os.getenv("EXPORT_ROOT", "exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(os.cpu_count() or 1)))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "8"))
+# A running job whose heartbeat is older than this is assumed orphaned (its
+# process died) and is put back in the queue.
+EXPORT_STALE_SECONDS = int(os.getenv("EXPORT_STALE_SECONDS", "120"))
+# How long shutdown waits for in-flight exports; unfinished ones are picked
+# up again by the stale-heartbeat sweep
+EXPORT_DRAIN_SECONDS = float(os.getenv("EXPORT_DRAIN_SECONDS", "60"))
+# Jobs one process runs at once; the rest stay queued, unclaimed, so memory
+# is bounded by this many exports rather than by the length of the queue
+EXPORT_MAX_JOBS = int(os.getenv("EXPORT_MAX_JOBS", "0")) or EXPORT_WORKERS
+# Finished artifacts and their job records are deleted after this long
+EXPORT_RETENTION_SECONDS = int(os.getenv("EXPORT_RETENTION_SECONDS", str(24 * 3600)))
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+VIDEO_FPS = int(os.getenv("VIDEO_FPS", "30"))
+# Frames are piped at this rate and ffmpeg duplicates them up to VIDEO_FPS,
+# so a slide held for N seconds costs N * VIDEO_INPUT_FPS raw frames on stdin.
+VIDEO_INPUT_FPS = int(os.getenv("VIDEO_INPUT_FPS", "4"))
+VIDEO_SLIDE_SECONDS = float(os.getenv("VIDEO_SLIDE_SECONDS", "3"))
+
+JOB_COLLECTION = "exportjob"
+
+EXPORT_MP_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+ARTIFACTS = {
+    'images': ('application/zip', 'slides.zip'),
+    'pptx': ('application/vnd.openxmlformats-officedocument.presentationml.presentation', 'storyboard.pptx'),
+    'video': ('video/mp4', 'storyboard.mp4'),
+}
+
+async def _render_batch(pool: Executor, batch: List[Tuple[int, dict]], cache: Optional[SlideCache], counts: Dict[str, int], batch_fn: Callable = render_png_batch) -> List[bytes]:
+    loop = asyncio.get_running_loop()
+    if cache is None:
+        return await loop.run_in_executor(pool, batch_fn, batch)
+    keys = [slide_key(slide, idx) for idx, slide in batch]
+    pngs = [await cache.aget(key) for key in keys]
+    misses = [i for i, png in enumerate(pngs) if png is None]
+    counts["hits"] += len(batch) - len(misses)
+    counts["misses"] += len(misses)
+    if misses:
+        rendered = await loop.run_in_executor(pool, render_png_batch, [batch[i] for i in misses])
+        for i, png in zip(misses, rendered):
+            pngs[i] = png
+            await cache.aput(keys[i], png)
+    return pngs
+
+async def _aiter_slides(slides: Union[List[dict], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+    if isinstance(slides, list):
+        for slide in slides:
+            yield slide
+    else:
+        async for slide in slides:
+            yield slide
+
+async def render_in_order(pool: Executor, slides: Union[List[dict], AsyncIterator[dict]], batch_size: int = EXPORT_BATCH_SIZE, window: Optional[int] = None, cache: Optional[SlideCache] = None, counts: Optional[Dict[str, int]] = None, batch_fn: Callable = render_png_batch) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    # Batches render in parallel across the pool; at most `window` batches are
+    # in flight so memory stays bounded, and results come back in slide order.
+    # Slides already in the cache skip the pool entirely (PNG output only).
+    # `slides` may be an async iterator (a Mongo cursor); it is only read as
+    # far ahead as the window needs.
+    counts = counts if counts is not None else {"hits": 0, "misses": 0}
+    source = _aiter_slides(slides)
+    position = 0
+    window = window or 2 * getattr(pool, "_max_workers", EXPORT_WORKERS)
+    in_flight = deque()
+
+    async def submit_next() -> None:
+        nonlocal position
+        batch = []
+        async for slide in source:
+            position += 1
+            batch.append((position, slide))
+            if len(batch) == batch_size:
+                break
+        if batch:
+            in_flight.append((batch, asyncio.ensure_future(_render_batch(pool, batch, cache, counts, batch_fn))))
+
+    for _ in range(window):
+        await submit_next()
+    try:
+        while in_flight:
+            batch, fut = in_flight.popleft()
+            pngs = await fut
+            await submit_next()
+            yield [(idx, png) for (idx, _), png in zip(batch, pngs)]
+    finally:
+        for _, fut in in_flight:
+            fut.cancel()
+
+async def export_images_zip(pool: Executor, slides: Union[List[dict], AsyncIterator[dict]], path: str, on_progress: Optional[Callable[[int], Awaitable[None]]] = None, batch_size: int = EXPORT_BATCH_SIZE, window: Optional[int] = None, cache: Optional[SlideCache] = None, counts: Optional[Dict[str, int]] = None) -> None:
+    tmp = path + ".part"
+    # PNG is already deflate-compressed; store it instead of compressing twice
+    zipf = await asyncio.to_thread(ZipFile, tmp, 'w', ZIP_STORED)
+    done = 0
+    try:
+        async for rendered in render_in_order(pool, slides, batch_size, window, cache, counts):
+            def write_batch():
+                for idx, png in rendered:
+                    zipf.writestr(f'slide_{idx}.png', png)
+            await asyncio.to_thread(write_batch)
+            done += len(rendered)
+            if on_progress is not None:
+                await on_progress(done)
+    except BaseException:
+        await asyncio.to_thread(zipf.close)
+        os.remove(tmp)
+        raise
+    await asyncio.to_thread(zipf.close)
+    os.replace(tmp, path)
+
+async def stream_images_zip(pool: Executor, slides: Union[List[dict], AsyncIterator[dict]], cache: Optional[SlideCache] = None) -> AsyncIterator[bytes]:
+    # One slide per batch and one batch per worker in flight: the first byte goes
+    # out after a single slide render and memory is bounded by a few slides.
+    sink = ZipSink()
+    zipf = ZipFile(sink, 'w', ZIP_STORED)
+    counts = {"hits": 0, "misses": 0}
+    async for rendered in render_in_order(pool, slides, batch_size=1, window=getattr(pool, "_max_workers", EXPORT_WORKERS), cache=cache, counts=counts):
+        for idx, png in rendered:
+            zipf.writestr(f'slide_{idx}.png', png)
+        yield sink.drain()
+    zipf.close()
+    yield sink.drain()
+    logger.info("Streamed %d slides (cache hits=%d misses=%d)", counts["hits"] + counts["misses"], counts["hits"], counts["misses"])
+
+def video_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None
+
+async def export_video(pool: Executor, slides: Union[List[dict], AsyncIterator[dict]], path: str, on_progress: Optional[Callable[[int], Awaitable[None]]] = None) -> None:
+    # Slides render on the pool (one in flight per worker) and raw frames are
+    # piped straight into ffmpeg: no intermediate images, and memory is bounded
+    # by a handful of frames whatever the storyboard length.
+    width, height = CANVAS_SIZE
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG_BIN, "-y", "-loglevel", "error", "-nostats",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-framerate", str(VIDEO_INPUT_FPS), "-i", "-",
+        "-r", str(VIDEO_FPS), "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+        "-f", "mp4", path,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    # Hold times for slides read ahead but not yet written
+    durations: Dict[int, float] = {}
+
+    async def tracked():
+        idx = 0
+        async for slide in _aiter_slides(slides):
+            idx += 1
+            durations[idx] = float(slide.get("duration") or VIDEO_SLIDE_SECONDS)
+            yield slide
+
+    try:
+        done = 0
+        async for rendered in render_in_order(pool, tracked(), batch_size=1, window=getattr(pool, "_max_workers", EXPORT_WORKERS), batch_fn=render_raw_batch):
+            for idx, frame in rendered:
+                seconds = durations.pop(idx)
+                for _ in range(max(1, round(seconds * VIDEO_INPUT_FPS))):
+                    proc.stdin.write(frame)
+                    await proc.stdin.drain()
+            done += len(rendered)
+            if on_progress is not None:
+                await on_progress(done)
+        proc.stdin.close()
+        stderr = await proc.stderr.read()
+        if await proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {stderr.decode(errors='replace')[-500:]}")
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+def _remove_expired_files(root: str, cutoff: float) -> int:
+    # Artifacts and leftover .part files, by modification time
+    removed = 0
+    for entry in os.scandir(root):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # another worker process swept it first
+    return removed
+
+class ExportJobManager:
+    # A job is claimed from the queue only when one of this process's
+    # max_jobs slots is free; until then any worker process may take it.
+    def __init__(self, workers: int = EXPORT_WORKERS, root: str = EXPORT_ROOT, max_jobs: int = EXPORT_MAX_JOBS):
+        self.workers = workers
+        self.root = root
+        self.max_jobs = max_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self._filling = asyncio.Lock()
+        self._closing = False
+        # Streamed exports in flight; they hold slots like jobs do
+        self._streams = 0
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # forkserver: workers must not inherit the parent's descriptors (an
+            # inherited ffmpeg stdin pipe would never see EOF). The initializer
+            # parses the PPTX base template once per worker process, up front.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=EXPORT_MP_CONTEXT, initializer=get_template)
+        return self._executor
+
+    async def _in_pool(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool(), fn, *args)
+
+    async def start(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        await self.resume()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def submit(self, project_id: str, fmt: str, owner_id: str) -> Dict:
+        job = await create_document(JOB_COLLECTION, ExportJob(project_id=project_id, format=fmt, owner_id=owner_id).dict())
+        await self._fill()
+        return job
+
+    async def get(self, job_id: str, owner_id: str) -> Optional[Dict]:
+        return await get_document(JOB_COLLECTION, {"id": job_id, "owner_id": owner_id})
+
+    async def _claim(self) -> Optional[Dict]:
+        # Atomic and oldest first, so only one worker process runs a given job
+        now = datetime.utcnow()
+        db = await get_db()
+        doc = await db[JOB_COLLECTION].find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "progress": 0, "heartbeat_at": now, "updated_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return to_public(doc) if doc else None
+
+    async def _fill(self) -> None:
+        # Start queued jobs while slots are free
+        async with self._filling:
+            while not self._closing and len(self._tasks) + self._streams < self.max_jobs:
+                job = await self._claim()
+                if job is None:
+                    return
+                task = asyncio.create_task(self._run(job))
+                self._tasks[job["id"]] = task
+                task.add_done_callback(lambda _, job_id=job["id"]: self._finished(job_id))
+
+    def _finished(self, job_id: str) -> None:
+        self._tasks.pop(job_id, None)
+        if not self._closing:
+            asyncio.ensure_future(self._fill())
+
+    def stream(self, body: AsyncIterator[bytes]) -> Optional[AsyncIterator[bytes]]:
+        # Runs a streamed export in one of the job slots; None when all are busy
+        if self._closing or len(self._tasks) + self._streams >= self.max_jobs:
+            return None
+        self._streams += 1
+        return self._streaming(body)
+
+    async def _streaming(self, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            self._streams -= 1
+            if not self._closing:
+                asyncio.ensure_future(self._fill())
+
+    async def resume(self) -> None:
+        # Jobs survive restarts: requeue orphaned ones, then pick up the queue.
+        db = await get_db()
+        stale = datetime.utcnow() - timedelta(seconds=EXPORT_STALE_SECONDS)
+        await db[JOB_COLLECTION].update_many({"status": "running", "heartbeat_at": {"$lt": stale}}, {"$set": {"status": "queued"}})
+        await self._fill()
+
+    async def expire(self) -> None:
+        # Retention: finished jobs go, and so do their files
+        cutoff = datetime.utcnow() - timedelta(seconds=EXPORT_RETENTION_SECONDS)
+        db = await get_db()
+        await db[JOB_COLLECTION].delete_many({"status": {"$in": ["done", "failed"]}, "updated_at": {"$lt": cutoff}})
+        removed = await asyncio.to_thread(_remove_expired_files, self.root, time.time() - EXPORT_RETENTION_SECONDS)
+        if removed:
+            logger.info("Removed %d expired export files", removed)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(EXPORT_STALE_SECONDS)
+            try:
+                await self.resume()
+                await self.expire()
+            except Exception:
+                logger.exception("Export job sweep failed")
+
+    async def _progress(self, job_id: str, **fields) -> None:
+        now = datetime.utcnow()
+        await update_document(JOB_COLLECTION, {"id": job_id}, {**fields, "heartbeat_at": now, "updated_at": now})
+
+    async def _run(self, job: Dict) -> None:
+        job_id = job["id"]
+        try:
+            project = await get_document("project", {"id": job["project_id"]})
+            if not project:
+                raise LookupError("Project not found")
+            # Collection-mode slides come from a cursor as rendering proceeds
+            slides = slide_source(project)
+            total = slide_total(project)
+            await self._progress(job_id, total=total)
+            path = os.path.join(self.root, f"{job_id}_{ARTIFACTS[job['format']][1]}")
+            if job["format"] == 'images':
+                counts = {"hits": 0, "misses": 0}
+                await export_images_zip(self.pool(), slides, path, lambda done: self._progress(job_id, progress=done, cache_hits=counts["hits"], cache_misses=counts["misses"]), cache=get_slide_cache(), counts=counts)
+            elif job["format"] == 'pptx':
+                await self._export_pptx(job_id, await slide_list(project), path)
+            elif job["format"] == 'video':
+                tmp = path + ".part"
+                await export_video(self.pool(), slides, tmp, lambda done: self._progress(job_id, progress=done))
+                os.replace(tmp, path)
+            else:
+                raise ValueError(f"Unsupported export format: {job['format']}")
+            await self._progress(job_id, status="done", progress=total, artifact=path)
+        except Exception as e:
+            logger.exception("Export job %s failed", job_id)
+            await self._progress(job_id, status="failed", error=str(e))
+
+    async def _export_pptx(self, job_id: str, slides: List[dict], path: str) -> None:
+        tmp = path + ".part"
+        try:
+            await self._in_pool(write_pptx, slides, tmp)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.replace(tmp, path)
+
+    async def shutdown(self, timeout: Optional[float] = None) -> None:
+        # Let in-flight exports finish (up to timeout) before tearing down the
+        # pool; nothing new is claimed meanwhile
+        self._closing = True
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks.values()), timeout=timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+export_jobs = ExportJobManager()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt is CPU-bound (~250ms per call); never run it on the event loop.
+HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")  # 'thread' or 'process'
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Module-level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return pwd_context.verify(password, hashed)
+    except (ValueError, TypeError):
+        return False
+
+class PasswordHasher:
+    def __init__(self, pool: str = HASH_POOL, workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.pool = pool
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._calls = 0
+        self._rejected = 0
+        self._total_ms = 0.0
+        self._latencies: Deque[float] = deque(maxlen=1024)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.pool == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_queue:
+            self._rejected += 1
+            raise HTTPException(status_code=503, detail="Authentication service busy, retry shortly", headers={"Retry-After": "1"})
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+            elapsed = (time.perf_counter() - start) * 1000
+            self._calls += 1
+            self._total_ms += elapsed
+            self._latencies.append(elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password, hashed)
+
+    def stats(self) -> Dict[str, float]:
+        recent = sorted(self._latencies)
+        def pct(p: float) -> float:
+            return recent[min(len(recent) - 1, int(len(recent) * p))] if recent else 0.0
+        return {
+            "pool": self.pool,
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            "calls": self._calls,
+            "rejected": self._rejected,
+            "avg_ms": self._total_ms / self._calls if self._calls else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+hasher = PasswordHasher()
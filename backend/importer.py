@@ -0,0 +1,321 @@
+import asyncio
+import codecs
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from starlette.responses import StreamingResponse
+
+from database import get_db, to_storage
+from schemas import MediaAsset, Project
+from slides import SLIDE_COLLECTION, SLIDE_STORAGE, ensure_slide_ids, fresh_slide_ids, slide_documents
+
+# Bulk ingestion: items arrive as NDJSON or a JSON array and are parsed as
+# the body streams in, validated a batch at a time off the event loop, and
+# written with unordered insert_many. The next batch is parsed and validated
+# while the previous one is being inserted. Progress goes back as NDJSON,
+# one line per batch, so memory stays bounded by a couple of batches.
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+
+KINDS = {"project": ("project", Project), "media": ("mediaasset", MediaAsset)}
+
+class ImportResponse(StreamingResponse):
+    # The request body is still being read while progress is sent, so the
+    # disconnect listener must not consume receive() messages.
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+    # Only the unfinished last line is kept, as pieces joined once it ends
+    pending: List[bytes] = []
+    size = 0
+    async for chunk in chunks:
+        *lines, tail = chunk.split(b"\n")
+        if lines:
+            lines[0] = b"".join(pending) + lines[0]
+            pending, size = [], 0
+        for line in lines:
+            if line.strip():
+                yield _loads(line)
+        if tail:
+            pending.append(tail)
+            size += len(tail)
+            if size > IMPORT_MAX_LINE_BYTES:
+                raise ValueError(f"NDJSON line exceeds {IMPORT_MAX_LINE_BYTES} bytes")
+    last = b"".join(pending)
+    if last.strip():
+        yield _loads(last)
+
+class _Unparsable:
+    def __init__(self, error: str):
+        self.error = error
+
+def _loads(line: bytes):
+    # A bad line fails only its own item
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return _Unparsable(str(e))
+
+_WHITESPACE = " \t\r\n"
+# Characters that can still extend a number decoded at the end of a chunk
+_NUMBER_TAIL = set("0123456789.eE+-")
+_HEX = set("0123456789abcdefABCDEF")
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+# JsonArrayScanner states: before "[", after "[", after an element, after ",", after "]"
+_START, _FIRST, _SEP, _VALUE, _END = range(5)
+
+def _incomplete(buf: str, e: json.JSONDecodeError) -> bool:
+    # Whether more input could still make the failing element valid
+    if e.msg.startswith("Unterminated string"):
+        return True
+    tail = buf[e.pos:].rstrip()
+    if e.msg.startswith("Invalid \\uXXXX escape"):
+        # A \uXXXX escape cut off at the end of the buffer, its string unclosed
+        return len(tail) <= 5 and all(c in _HEX for c in tail[1:])
+    return not tail or any(lit.startswith(tail) for lit in _LITERALS)
+
+class JsonArrayScanner:
+    """Pulls complete elements off a JSON array fed in text pieces. Only the
+    unfinished element stays buffered; errors are raised at the element
+    where they occur, after everything before it has been yielded."""
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.state = _START
+
+    def feed(self, text: str, final: bool = False) -> Iterator[object]:
+        buf = self.buf + text
+        pos, n = 0, len(buf)
+        while True:
+            while pos < n and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == n:
+                break
+            ch = buf[pos]
+            if self.state == _START:
+                if ch != "[":
+                    raise ValueError("Expected a JSON array")
+                self.state, pos = _FIRST, pos + 1
+            elif self.state == _END:
+                raise ValueError("Unexpected data after the JSON array")
+            elif self.state == _SEP:
+                if ch not in ",]":
+                    raise ValueError(f"Expected ',' or ']' after an array element, found {ch!r}")
+                self.state, pos = (_VALUE if ch == "," else _END), pos + 1
+            elif ch == "]" and self.state == _FIRST:
+                self.state, pos = _END, pos + 1
+            elif ch in ",]":
+                raise ValueError(f"Expected an array element, found {ch!r}")
+            else:
+                try:
+                    item, end = self.decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    if not _incomplete(buf, e):
+                        raise ValueError(f"Invalid JSON in array element: {e.msg}")
+                    if final:
+                        raise ValueError("Truncated JSON array")
+                    break  # element continues in the next piece
+                if not final and all(c in _NUMBER_TAIL for c in buf[end:]):
+                    break  # a number may continue in the next piece
+                self.state, pos = _SEP, end
+                yield item
+        self.buf = buf[pos:]
+        if final and self.state != _END:
+            raise ValueError("Truncated JSON array")
+        if len(self.buf) > IMPORT_MAX_LINE_BYTES:
+            raise ValueError(f"Array element exceeds {IMPORT_MAX_LINE_BYTES} bytes")
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+    scanner = JsonArrayScanner()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        try:
+            # Holds back at most a partial multi-byte character
+            text = utf8.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Request body is not valid UTF-8: {e.reason}")
+        for item in scanner.feed(text):
+            yield item
+    try:
+        text = utf8.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Request body is not valid UTF-8: {e.reason}")
+    for item in scanner.feed(text, final=True):
+        yield item
+
+def _prepare(item, owner_id: str, now: datetime) -> Tuple[str, dict]:
+    # Returns (collection, storage doc) or raises ValueError with the reason
+    if isinstance(item, _Unparsable):
+        raise ValueError(f"Invalid JSON: {item.error}")
+    if not isinstance(item, dict):
+        raise ValueError("Item must be an object")
+    fields = dict(item)
+    kind = fields.pop("kind", "project")
+    if not isinstance(kind, str) or kind not in KINDS:
+        raise ValueError(f"Unknown kind: {kind}")
+    if fields.get("owner_id") not in (None, "", owner_id):
+        raise ValueError("owner_id does not match the authenticated user")
+    fields["owner_id"] = owner_id
+    fields.pop("id", None)
+    collection, model = KINDS[kind]
+    if kind == "project":
+        fields.setdefault("created_at", now)
+        fields.setdefault("updated_at", now)
+        fields["version"] = 0
+        fields.pop("slide_count", None)
+    else:
+        # Imported assets keep their original URL; they hold no reference
+        # on a stored blob, so the content hash is not carried over
+        fields.pop("sha256", None)
+    try:
+        obj = model(**fields)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    # Neither model nests other models, so a shallow copy of the validated
+    # fields is what .dict() would build, at a fraction of the cost
+    doc = to_storage(dict(obj))
+    doc.pop("slide_count", None)
+    doc["_id"] = ObjectId()
+    if kind == "project":
+        if SLIDE_STORAGE == "collection":
+            # Backups carry slide ids; slide documents always get new ones
+            doc["slides"] = fresh_slide_ids(doc["slides"])
+            doc["slide_storage"] = "collection"
+            doc["slide_count"] = len(doc["slides"])
+        else:
+            doc["slides"] = ensure_slide_ids(doc["slides"])
+    return collection, doc
+
+def _validate_batch(items: List[Tuple[int, object]], owner_id: str) -> Tuple[Dict[str, List[Tuple[int, dict]]], List[dict]]:
+    now = datetime.utcnow()
+    docs: Dict[str, List[Tuple[int, dict]]] = {}
+    errors = []
+    for index, item in items:
+        try:
+            collection, doc = _prepare(item, owner_id, now)
+        except ValueError as e:
+            errors.append({"index": index, "status": "error", "error": str(e)})
+            continue
+        docs.setdefault(collection, []).append((index, doc))
+    return docs, errors
+
+async def _insert_batch(docs: Dict[str, List[Tuple[int, dict]]]) -> List[dict]:
+    db = await get_db()
+    results = []
+    slide_docs = []
+    # Position in results of each project whose slides are in slide_docs
+    slide_owner: Dict[str, int] = {}
+    for collection, indexed in docs.items():
+        slides = {}
+        if collection == "project" and SLIDE_STORAGE == "collection":
+            slides = {doc["_id"]: doc.pop("slides") for _, doc in indexed}
+        failed: Dict[int, str] = {}
+        try:
+            await db[collection].insert_many([doc for _, doc in indexed], ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything except the reported documents was written
+            failed = {err["index"]: err.get("errmsg", "write failed") for err in e.details.get("writeErrors", [])}
+        for pos, (index, doc) in enumerate(indexed):
+            if pos in failed:
+                results.append({"index": index, "status": "error", "error": failed[pos]})
+                continue
+            results.append({"index": index, "status": "ok", "kind": "project" if collection == "project" else "media", "id": str(doc["_id"])})
+            if doc["_id"] in slides:
+                slide_owner[str(doc["_id"])] = len(results) - 1
+                slide_docs.extend(slide_documents(str(doc["_id"]), slides[doc["_id"]]))
+    if slide_docs:
+        # Slides of every project in the batch go in one unordered write
+        try:
+            await db[SLIDE_COLLECTION].insert_many(slide_docs, ordered=False)
+        except BulkWriteError as e:
+            # Roll back the projects that lost slides; the rest stand
+            errors = {}
+            for err in e.details.get("writeErrors", []):
+                errors.setdefault(slide_docs[err["index"]]["project_id"], err.get("errmsg", "write failed"))
+            await db["project"].delete_many({"_id": {"$in": [ObjectId(pid) for pid in errors]}})
+            await db[SLIDE_COLLECTION].delete_many({"project_id": {"$in": list(errors)}})
+            for pid, error in errors.items():
+                pos = slide_owner[pid]
+                results[pos] = {"index": results[pos]["index"], "status": "error", "error": f"Slides not saved: {error}"}
+    return results
+
+async def run_import(items: AsyncIterator[object], owner_id: str, errors_only: bool = False, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    totals = {"processed": 0, "inserted": 0, "failed": 0}
+    batch_no = 0
+    pending: Optional[asyncio.Task] = None
+    pending_errors: List[dict] = []
+
+    def report(results: List[dict], final: bool = False, error: Optional[str] = None) -> bytes:
+        nonlocal batch_no
+        ok = sum(1 for r in results if r["status"] == "ok")
+        totals["processed"] += len(results)
+        totals["inserted"] += ok
+        totals["failed"] += len(results) - ok
+        line = {"batch": batch_no, **totals}
+        batch_no += 1
+        if final:
+            line["done"] = True
+        if error:
+            line["error"] = error
+        results = sorted(results, key=lambda r: r["index"])
+        line["results"] = [r for r in results if r["status"] != "ok"] if errors_only else results
+        return json.dumps(line, default=str).encode() + b"\n"
+
+    async def flush() -> Optional[bytes]:
+        nonlocal pending, pending_errors
+        if pending is None:
+            return None
+        results = await pending
+        line = report(results + pending_errors)
+        pending, pending_errors = None, []
+        return line
+
+    parse_error: Optional[str] = None
+
+    async def guarded() -> AsyncIterator[object]:
+        # A malformed body ends the import; items parsed before it still go in
+        nonlocal parse_error
+        try:
+            async for item in items:
+                yield item
+        except ValueError as e:
+            parse_error = str(e)
+
+    async def submit(batch: List[Tuple[int, object]]) -> Optional[bytes]:
+        nonlocal pending, pending_errors
+        docs, errors = await asyncio.to_thread(_validate_batch, batch, owner_id)
+        line = await flush()
+        pending, pending_errors = asyncio.ensure_future(_insert_batch(docs)), errors
+        return line
+
+    batch: List[Tuple[int, object]] = []
+    index = 0
+    try:
+        async for item in guarded():
+            batch.append((index, item))
+            index += 1
+            if len(batch) == batch_size:
+                line = await submit(batch)
+                batch = []
+                if line:
+                    yield line
+        if batch:
+            line = await submit(batch)
+            if line:
+                yield line
+        line = await flush()
+        if line:
+            yield line
+        yield report([], final=True, error=parse_error)
+    finally:
+        if pending is not None:
+            pending.cancel()
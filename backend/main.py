@@ -1,24 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from typing import List, Optional
 from datetime import datetime, timedelta
-import io
+import hashlib
+import os
 import secrets
-from passlib.context import CryptContext
-from jose import jwt
 from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
 
-from database import create_document, get_documents, get_document, update_document, delete_document
-from schemas import User, Project, MediaAsset, ShareLink, AuthPayload, SlideExportRequest
+from database import create_document, get_documents, get_document, get_page, update_document, delete_document, init_indexes, connect_db, close_db, pool_stats, InvalidCursor
+from schemas import User, Project, ProjectListItem, MediaAsset, MediaAssetListItem, ShareLink, AuthPayload, SlideExportRequest, ExportJob, SlidePatch, SlideInsert, SlideOrder, SlideWrite
+from hashing import hasher
+from media import release_blob, store_upload
+from storage import get_storage
+from uploads import receive_upload
+from exports import ARTIFACTS, EXPORT_DRAIN_SECONDS, export_jobs, stream_images_zip, video_available
+from slide_cache import get_slide_cache, open_slide_cache
+from pptx_engine import iter_pptx
+from response_cache import CachedResponse, project_cache
+from sharing import share_resolver
+from serialization import FastJSONResponse, db_response, dumps
+from auth import CurrentUser, check_owner, create_access_token, get_current_user, token_cache, verify_google_id_token
+from metrics import Gauges, Histogram, RequestTimer, registry
+from importer import ImportResponse, iter_json_array, iter_ndjson, run_import
+from backup import decode_position, iter_backup
+from slides import SLIDE_PREVIEW_COUNT, SLIDE_STORAGE, attach_preview, delete_slide, drop_slides, ensure_slide_ids, fresh_slide_ids, insert_slide, patch_slide, reorder_slides, slide_list, slide_page, slide_source, store_slides
 
-SECRET_KEY = "supersecretkey"  # for demo
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-app = FastAPI(title="Event Storyboard API")
+app = FastAPI(title="Event Storyboard API", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,34 +35,138 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(RequestTimer, histogram=registry.register(Histogram("http_request_duration_seconds", "Request handling time including the response body, by route")))
+
+registry.register(Gauges("password_hash", "Password hashing pool state", hasher.stats))
+registry.register(Gauges("project_cache", "Project response cache counters", lambda: {"hits": project_cache.hits, "misses": project_cache.misses}))
+registry.register(Gauges("auth_token_cache", "Decoded token cache counters", lambda: {"hits": token_cache.hits, "misses": token_cache.misses}))
+
+# Scrapers authenticate with this bearer token. Without one /metrics is off
+# unless METRICS_PUBLIC=1 opens it (e.g. when only reachable internally).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0") == "1"
+
+@app.on_event("startup")
+async def startup():
+    await connect_db()
+    await init_indexes()
+    await open_slide_cache()
+    await export_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await export_jobs.shutdown(EXPORT_DRAIN_SECONDS)
+    hasher.shutdown()
+    # Last: draining exports still writes job status
+    close_db()
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+
+def parse_fields(fields: Optional[str], model) -> Optional[dict]:
+    # fields=title,updated_at -> Motor projection; unknown names are rejected
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in model.__fields__]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {("_id" if f == "id" else f): 1 for f in names}
+
+async def fetch_page(response: Response, collection_name: str, filt: dict, limit: int, cursor: Optional[str], sort_field: str, projection: Optional[dict]):
+    try:
+        items, next_cursor = await get_page(collection_name, filt, limit, cursor, sort_field, projection)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+def project_stamp(proj: dict) -> tuple:
+    # Every write to a project sets updated_at and bumps version
+    return proj.get("updated_at"), proj.get("version", 0)
+
+def project_etag(proj: dict) -> str:
+    updated = proj.get("updated_at")
+    stamp = updated.isoformat() if isinstance(updated, datetime) else str(updated)
+    return '"' + hashlib.sha1(f'{proj["id"]}:{stamp}'.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+def project_acl(proj: dict) -> tuple:
+    return (proj.get("owner_id"), *(proj.get("collaborators") or []))
+
+def acl_allows(acl: tuple, user: CurrentUser) -> bool:
+    # Collaborators are listed by user id or email
+    return user.id in acl or (user.email is not None and user.email in acl)
+
+def can_read(proj: dict, user: CurrentUser) -> bool:
+    return acl_allows(project_acl(proj), user)
+
+async def project_response(project_id: str, request: Request, proj: Optional[dict] = None, user: Optional[CurrentUser] = None) -> Response:
+    # Serialized project bodies are cached with their ETag: a matching
+    # If-None-Match on a cache hit is a 304 without touching Mongo or Pydantic.
+    # With a user, only the owner and collaborators (by id or email) may read.
+    key = f"project:{project_id}"
+    cached = await project_cache.get(key)
+    if cached is not None and project_cache.revalidate:
+        # Another worker may have changed the project since this one cached it
+        current = await get_document("project", {"id": project_id}, {"updated_at": 1, "version": 1})
+        if current is None or project_stamp(current) != cached.stamp:
+            cached = None
+    if cached is None:
+        version = project_cache.version()
+        if proj is None:
+            proj = await get_document("project", {"id": project_id})
+        if not proj:
+            raise HTTPException(status_code=404, detail="Project not found")
+        await attach_preview(proj)
+        cached = CachedResponse(etag=project_etag(proj), body=dumps(Project, proj), acl=project_acl(proj), stamp=project_stamp(proj))
+        await project_cache.put(key, cached, version)
+    if user is not None and not acl_allows(cached.acl, user):
+        raise HTTPException(status_code=404, detail="Project not found")
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-# Simple in-API token creation for demo; in production use OAuth flows
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 @app.get("/test")
 async def test():
-    return {"status": "ok"}
+    return {"status": "ok", "mongo_pool": pool_stats.stats()}
 
-# Auth Endpoints (email + password demo; Google SSO placeholder token exchange)
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not METRICS_TOKEN:
+        if not METRICS_PUBLIC:
+            raise HTTPException(status_code=404, detail="Not Found")
+    elif not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Auth Endpoints (email + password; Google sign-in with a verified ID token)
 @app.post("/auth/register", response_model=Token)
 async def register(payload: AuthPayload):
     existing = await get_documents("user", {"email": payload.email}, 1)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed = pwd_context.hash(payload.password or secrets.token_hex(8))
+    hashed = await hasher.hash(payload.password or secrets.token_hex(8))
     user = User(email=payload.email, name=payload.name, hashed_password=hashed)
-    doc = await create_document("user", user.dict())
+    try:
+        doc = await create_document("user", user.dict())
+    except DuplicateKeyError:
+        # A concurrent registration with the same email got there first
+        raise HTTPException(status_code=400, detail="Email already registered")
     token = create_access_token({"sub": doc["id"], "email": doc["email"]})
     return Token(access_token=token)
 
@@ -63,141 +176,295 @@ async def login(payload: AuthPayload):
     if not users:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     user = users[0]
-    if not payload.password or not pwd_context.verify(payload.password, user.get("hashed_password", "")):
+    if not payload.password or not await hasher.verify(payload.password, user.get("hashed_password", "")):
         raise HTTPException(status_code=400, detail="Invalid credentials")
     token = create_access_token({"sub": user["id"], "email": user["email"]})
     return Token(access_token=token)
 
 @app.post("/auth/google", response_model=Token)
 async def google_sso(id_token: str = Form(...)):
-    # In production, verify id_token with Google; here we accept and create/fetch user by email claim placeholder
-    # For demo, we treat id_token as email
-    email = id_token
+    # Only a verified Google email may sign in to (or link) the account with that email
+    email = await verify_google_id_token(id_token)
     users = await get_documents("user", {"email": email}, 1)
     if users:
         user = users[0]
     else:
-        user = (await create_document("user", User(email=email, provider="google").dict()))
+        try:
+            user = (await create_document("user", User(email=email, provider="google").dict()))
+        except DuplicateKeyError:
+            # A concurrent first sign-in (or registration) created the account
+            users = await get_documents("user", {"email": email}, 1)
+            if not users:
+                raise HTTPException(status_code=400, detail="Email already registered")
+            user = users[0]
     token = create_access_token({"sub": user["id"], "email": user["email"]})
     return Token(access_token=token)
 
 # Projects CRUD
 @app.post("/projects", response_model=Project)
-async def create_project(project: Project):
+async def create_project(project: Project, user: CurrentUser = Depends(get_current_user)):
+    project.owner_id = check_owner(user, project.owner_id)
     now = datetime.utcnow()
     project.created_at = now
     project.updated_at = now
-    doc = await create_document("project", project.dict())
-    return Project(**doc)
+    project.slides = ensure_slide_ids(project.slides)
+    project.version = 0
+    if SLIDE_STORAGE != "collection":
+        doc = await create_document("project", project.dict(exclude={"slide_count"}))
+        return db_response(Project, doc)
+    project.slides = fresh_slide_ids(project.slides)
+    doc = await create_document("project", {**project.dict(exclude={"slides", "slide_count"}), "slide_storage": "collection", "slide_count": len(project.slides)})
+    try:
+        await store_slides(doc["id"], project.slides)
+    except BaseException:
+        # No project without its slides
+        await delete_document("project", {"id": doc["id"]})
+        await drop_slides(doc["id"])
+        raise
+    doc["slides"] = project.slides[:SLIDE_PREVIEW_COUNT]
+    return db_response(Project, doc)
 
-@app.get("/projects", response_model=List[Project])
-async def list_projects(owner_id: Optional[str] = None):
-    projects = await get_documents("project", {"owner_id": owner_id} if owner_id else {})
-    return [Project(**p) for p in projects]
+@app.get("/projects", response_model=List[ProjectListItem], response_model_exclude_unset=True)
+async def list_projects(response: Response, user: CurrentUser = Depends(get_current_user), owner_id: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), fields: Optional[str] = None, summary: bool = False):
+    owner_id = check_owner(user, owner_id)
+    projection = parse_fields(fields, Project)
+    if summary:
+        # Everything except slides, plus a server-side slide count
+        projection = projection or {f: 1 for f in Project.__fields__ if f != "id"}
+        projection.pop("slides", None)
+        # Collection-mode projects keep a stored count and no slides array
+        projection["slide_count"] = {"$ifNull": ["$slide_count", {"$size": {"$ifNull": ["$slides", []]}}]}
+    projects = await fetch_page(response, "project", {"owner_id": owner_id}, limit, cursor, "updated_at", projection)
+    return db_response(ProjectListItem, projects, response)
 
 @app.get("/projects/{project_id}", response_model=Project)
-async def get_project(project_id: str):
-    proj = await get_document("project", {"id": project_id})
-    if not proj:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return Project(**proj)
+async def get_project(project_id: str, request: Request, user: CurrentUser = Depends(get_current_user)):
+    return await project_response(project_id, request, user=user)
 
 @app.put("/projects/{project_id}", response_model=Project)
-async def update_project(project_id: str, project: Project):
+async def update_project(project_id: str, project: Project, user: CurrentUser = Depends(get_current_user)):
+    slides_sent = "slides" in project.__fields_set__
+    project.owner_id = check_owner(user, project.owner_id)
     project.updated_at = datetime.utcnow()
-    updated = await update_document("project", {"id": project_id}, project.dict())
+    project.slides = ensure_slide_ids(project.slides)
+    data = project.dict(exclude={"version", "slide_count"})
+    updated = await update_document("project", {"id": project_id, "owner_id": user.id, "slide_storage": {"$ne": "collection"}}, data, inc={"version": 1})
+    if not updated:
+        # Slides in the slide collection are only changed through the slide endpoints
+        if slides_sent:
+            if await get_document("project", {"id": project_id, "owner_id": user.id}):
+                raise HTTPException(status_code=409, detail="This project's slides are edited through the slide endpoints; send the PUT without slides")
+            raise HTTPException(status_code=404, detail="Project not found")
+        data.pop("slides")
+        updated = await update_document("project", {"id": project_id, "owner_id": user.id}, data, inc={"version": 1})
+    await project_cache.invalidate(f"project:{project_id}")
     if not updated:
         raise HTTPException(status_code=404, detail="Project not found")
-    return Project(**updated)
+    return db_response(Project, await attach_preview(updated))
 
 @app.delete("/projects/{project_id}")
-async def delete_project(project_id: str):
-    ok = await delete_document("project", {"id": project_id})
+async def delete_project(project_id: str, user: CurrentUser = Depends(get_current_user)):
+    ok = await delete_document("project", {"id": project_id, "owner_id": user.id})
+    await project_cache.invalidate(f"project:{project_id}")
+    if ok:
+        await drop_slides(project_id)
     return {"success": ok}
 
-# Media upload (store to local for demo) and metadata record
-@app.post("/media/upload", response_model=MediaAsset)
-async def upload_media(owner_id: str = Form(...), project_id: Optional[str] = Form(None), file: UploadFile = File(...)):
-    content = await file.read()
-    fname = f"uploads_{secrets.token_hex(4)}_{file.filename}"
-    with open(fname, "wb") as f:
-        f.write(content)
-    asset = MediaAsset(owner_id=owner_id, project_id=project_id, url=fname, type='video' if file.content_type.startswith('video') else 'image', name=file.filename)
+async def slides_response(proj: dict, response: Response, limit: int, cursor: Optional[str]) -> List[dict]:
+    try:
+        slides, next_cursor = await slide_page(proj, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return slides
+
+@app.get("/projects/{project_id}/slides", response_model=List[dict])
+async def list_slides(project_id: str, response: Response, user: CurrentUser = Depends(get_current_user), cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX)):
+    proj = await get_document("project", {"id": project_id})
+    if not proj or not can_read(proj, user):
+        raise HTTPException(status_code=404, detail="Project not found")
+    return await slides_response(proj, response, limit, cursor)
+
+# Slide edits: one small conditional update per change instead of a full PUT.
+# A stale version gets 409 with the current version in the detail.
+@app.patch("/projects/{project_id}/slides/{slide_id}", response_model=SlideWrite)
+async def update_slide(project_id: str, slide_id: str, body: SlidePatch, user: CurrentUser = Depends(get_current_user)):
+    version = await patch_slide(project_id, user.id, slide_id, body.version, body.changes)
+    await project_cache.invalidate(f"project:{project_id}")
+    return SlideWrite(version=version, slide_id=slide_id)
+
+@app.post("/projects/{project_id}/slides", response_model=SlideWrite, status_code=201)
+async def add_slide(project_id: str, body: SlideInsert, user: CurrentUser = Depends(get_current_user)):
+    version, slide_id = await insert_slide(project_id, user.id, body.version, body.slide, body.index)
+    await project_cache.invalidate(f"project:{project_id}")
+    return SlideWrite(version=version, slide_id=slide_id)
+
+@app.put("/projects/{project_id}/slides/order", response_model=SlideWrite)
+async def order_slides(project_id: str, body: SlideOrder, user: CurrentUser = Depends(get_current_user)):
+    version = await reorder_slides(project_id, user.id, body.version, body.order)
+    await project_cache.invalidate(f"project:{project_id}")
+    return SlideWrite(version=version)
+
+@app.delete("/projects/{project_id}/slides/{slide_id}", response_model=SlideWrite)
+async def remove_slide(project_id: str, slide_id: str, version: int, user: CurrentUser = Depends(get_current_user)):
+    version = await delete_slide(project_id, user.id, slide_id, version)
+    await project_cache.invalidate(f"project:{project_id}")
+    return SlideWrite(version=version, slide_id=slide_id)
+
+# Bulk import: NDJSON (one item per line) or a JSON array of items, each
+# {"kind": "project" | "media", ...fields}. The response streams one NDJSON
+# progress line per batch with per-item results; errors=true lists failures only.
+@app.post("/import")
+async def bulk_import(request: Request, user: CurrentUser = Depends(get_current_user), errors: bool = False):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        items = iter_json_array(request.stream())
+    else:
+        items = iter_ndjson(request.stream())
+    return ImportResponse(run_import(items, user.id, errors_only=errors), media_type="application/x-ndjson")
+
+# Backup: every project, then every media asset of the caller as NDJSON in
+# the /import item format. Each line has a cursor; pass the last one received
+# to resume after a dropped connection. gzip=true compresses on the fly.
+@app.get("/backup")
+async def backup(user: CurrentUser = Depends(get_current_user), cursor: Optional[str] = None, gzip: bool = False):
+    if cursor:
+        try:
+            decode_position(cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    filename = "backup.ndjson.gz" if gzip else "backup.ndjson"
+    return StreamingResponse(
+        iter_backup(user.id, cursor, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# Media upload: the multipart body is read off the request stream and the
+# file written once, in chunks, into content-addressed storage; a duplicate
+# upload only adds a metadata record referencing the existing blob
+UPLOAD_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}, "owner_id": {"type": "string"}, "project_id": {"type": "string"}},
+}}}}}
+
+@app.post("/media/upload", response_model=MediaAsset, openapi_extra=UPLOAD_FORM)
+async def upload_media(request: Request, user: CurrentUser = Depends(get_current_user)):
+    upload = await receive_upload(request, get_storage())
+    try:
+        owner_id = check_owner(user, upload.fields.get("owner_id"))
+    except HTTPException:
+        await get_storage().abort(upload.spooled.handle)
+        raise
+    stored = await store_upload(upload.spooled)
+    asset = MediaAsset(owner_id=owner_id, project_id=upload.fields.get("project_id") or None, url=stored.url, type='video' if (upload.content_type or '').startswith('video') else 'image', name=upload.filename, size=stored.size, sha256=stored.sha256)
     doc = await create_document("mediaasset", asset.dict())
-    return MediaAsset(**doc)
+    return db_response(MediaAsset, doc)
 
-@app.get("/media", response_model=List[MediaAsset])
-async def list_media(owner_id: Optional[str] = None, project_id: Optional[str] = None):
-    filt = {}
-    if owner_id:
-        filt["owner_id"] = owner_id
+@app.get("/media", response_model=List[MediaAssetListItem], response_model_exclude_unset=True)
+async def list_media(response: Response, user: CurrentUser = Depends(get_current_user), owner_id: Optional[str] = None, project_id: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), fields: Optional[str] = None):
+    filt = {"owner_id": check_owner(user, owner_id)}
     if project_id:
         filt["project_id"] = project_id
-    assets = await get_documents("mediaasset", filt)
-    return [MediaAsset(**a) for a in assets]
+    assets = await fetch_page(response, "mediaasset", filt, limit, cursor, "_id", parse_fields(fields, MediaAsset))
+    return db_response(MediaAssetListItem, assets, response)
+
+@app.delete("/media/{asset_id}")
+async def delete_media(asset_id: str, user: CurrentUser = Depends(get_current_user)):
+    asset = await get_document("mediaasset", {"id": asset_id, "owner_id": user.id})
+    if not asset:
+        raise HTTPException(status_code=404, detail="Media not found")
+    ok = await delete_document("mediaasset", {"id": asset_id})
+    if ok and asset.get("sha256"):
+        await release_blob(asset["sha256"])
+    return {"success": ok}
 
 # Share Permissions
 @app.post("/share", response_model=ShareLink)
-async def create_share_link(project_id: str = Form(...), role: str = Form('viewer')):
+async def create_share_link(project_id: str = Form(...), role: str = Form('viewer'), user: CurrentUser = Depends(get_current_user)):
+    if not await get_document("project", {"id": project_id, "owner_id": user.id}):
+        raise HTTPException(status_code=404, detail="Project not found")
     token = secrets.token_urlsafe(16)
     link = ShareLink(project_id=project_id, token=token, role=role, created_at=datetime.utcnow(), expires_at=datetime.utcnow() + timedelta(days=14))
     doc = await create_document("sharelink", link.dict())
-    return ShareLink(**doc)
+    await share_resolver.forget(token)
+    return db_response(ShareLink, doc)
 
-@app.get("/share/{token}", response_model=Project)
-async def get_shared_project(token: str):
-    links = await get_documents("sharelink", {"token": token}, 1)
-    if not links:
+async def resolve_share(token: str):
+    grant, proj = await share_resolver.resolve(token)
+    if grant is None:
         raise HTTPException(status_code=404, detail="Link not found")
-    link = links[0]
-    proj = await get_document("project", {"id": link["project_id"]})
+    # The TTL index removes expired links, but only once its monitor runs
+    if grant.expired():
+        raise HTTPException(status_code=410, detail="Link expired")
+    return grant, proj
+
+@app.get("/share/{token}", response_model=Project)
+async def get_shared_project(token: str, request: Request):
+    grant, proj = await resolve_share(token)
+    return await project_response(grant.project_id, request, proj)
+
+# Slides past the preview in the shared project, paged like /projects/{id}/slides
+@app.get("/share/{token}/slides", response_model=List[dict])
+async def list_shared_slides(token: str, response: Response, cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX)):
+    grant, proj = await resolve_share(token)
+    if proj is None:
+        proj = await get_document("project", {"id": grant.project_id})
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
-    return Project(**proj)
-
-# Export endpoints (basic demo implementations)
-from PIL import Image, ImageDraw, ImageFont
-from pptx import Presentation
-from pptx.util import Inches
+    return await slides_response(proj, response, limit, cursor)
 
-@app.post("/export")
-async def export_storyboard(req: SlideExportRequest):
+# Export jobs: POST /export queues a render on the export process pool;
+# poll GET /export/{job_id} and fetch the artifact once status is 'done'.
+# POST /export?stream=true streams the file directly as slides are produced.
+@app.post("/export", response_model=ExportJob, status_code=202)
+async def export_storyboard(req: SlideExportRequest, stream: bool = False, user: CurrentUser = Depends(get_current_user)):
+    if req.format == 'video' and not video_available():
+        raise HTTPException(status_code=501, detail="Video export requires ffmpeg on the server")
+    if req.format not in ARTIFACTS:
+        raise HTTPException(status_code=400, detail="Invalid format")
     proj = await get_document("project", {"id": req.project_id})
-    if not proj:
+    # Same access rule as reading the project
+    if not proj or not can_read(proj, user):
         raise HTTPException(status_code=404, detail="Project not found")
-    slides: List[dict] = proj.get("slides", [])
-
-    if req.format == 'images':
-        # Create a simple image for each slide
-        zip_bytes = io.BytesIO()
-        from zipfile import ZipFile, ZIP_DEFLATED
-        with ZipFile(zip_bytes, 'w', ZIP_DEFLATED) as zipf:
-            for idx, s in enumerate(slides or [{}], start=1):
-                img = Image.new('RGB', (1080, 1920), color=s.get('bg', '#111827'))
-                draw = ImageDraw.Draw(img)
-                text = s.get('text', f'Slide {idx}')
-                draw.text((50, 50), text, fill=s.get('color', '#ffffff'))
-                buf = io.BytesIO()
-                img.save(buf, format='PNG')
-                buf.seek(0)
-                zipf.writestr(f'slide_{idx}.png', buf.read())
-        zip_bytes.seek(0)
-        return StreamingResponse(zip_bytes, media_type='application/zip', headers={'Content-Disposition': 'attachment; filename="slides.zip"'})
-
-    if req.format == 'pptx':
-        prs = Presentation()
-        for idx, s in enumerate(slides or [{}], start=1):
-            slide = prs.slides.add_slide(prs.slide_layouts[5])
-            txBox = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(8), Inches(5))
-            tf = txBox.text_frame
-            tf.text = s.get('text', f'Slide {idx}')
-        buf = io.BytesIO()
-        prs.save(buf)
-        buf.seek(0)
-        return StreamingResponse(buf, media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation', headers={'Content-Disposition': 'attachment; filename="storyboard.pptx"'})
-
-    # For video, return not implemented demo
-    if req.format == 'video':
-        raise HTTPException(status_code=501, detail="Video export not implemented in demo")
-
-    raise HTTPException(status_code=400, detail="Invalid format")
+    if stream:
+        if req.format == 'video':
+            raise HTTPException(status_code=400, detail="Video exports cannot be streamed; poll the export job")
+        media_type, filename = ARTIFACTS[req.format]
+        if req.format == 'images':
+            # Renders on the shared pool, so the stream takes an export slot
+            body = export_jobs.stream(stream_images_zip(export_jobs.pool(), slide_source(proj), get_slide_cache()))
+            if body is None:
+                raise HTTPException(status_code=503, detail="Too many exports in progress; retry shortly or poll an export job", headers={"Retry-After": "5"})
+        else:
+            # Sync generator: Starlette iterates it in the threadpool. The
+            # package lists every slide up front, so slides are loaded first.
+            body = iter_pptx(await slide_list(proj))
+        return StreamingResponse(body, media_type=media_type, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    job = await export_jobs.submit(req.project_id, req.format, user.id)
+    return export_job_response(job)
+
+def export_job_response(job: dict) -> ExportJob:
+    out = ExportJob(**{**job, "artifact": None})
+    if job["status"] == "done":
+        out.download_url = f"/export/{job['id']}/download"
+    return out
+
+@app.get("/export/{job_id}", response_model=ExportJob)
+async def get_export_job(job_id: str, user: CurrentUser = Depends(get_current_user)):
+    job = await export_jobs.get(job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return export_job_response(job)
+
+@app.get("/export/{job_id}/download")
+async def download_export(job_id: str, user: CurrentUser = Depends(get_current_user)):
+    job = await export_jobs.get(job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "done" or not job.get("artifact"):
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    media_type, filename = ARTIFACTS[job["format"]]
+    return FileResponse(job["artifact"], media_type=media_type, filename=filename)
@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import get_db
+from storage import SpooledUpload, StoredObject, content_key, get_storage
+
+# One record per distinct blob, keyed by SHA-256, counting the mediaasset
+# documents that reference it. An orphaned record is tombstoned (deleting)
+# while its file is removed, and only dropped after, so an upload of the same
+# content can't revive it in between and lose its file to the delete.
+BLOB_COLLECTION = "mediablob"
+# A tombstone this old belongs to a release that died half way; uploads take it over
+BLOB_DELETE_STALE = timedelta(seconds=60)
+
+async def store_upload(spooled: SpooledUpload) -> StoredObject:
+    storage = get_storage()
+    key = content_key(spooled.sha256)
+    db = await get_db()
+    try:
+        while True:
+            try:
+                previous = await db[BLOB_COLLECTION].find_one_and_update(
+                    {"_id": spooled.sha256, "deleting_at": {"$not": {"$gt": datetime.utcnow() - BLOB_DELETE_STALE}}},
+                    {"$inc": {"refs": 1}, "$unset": {"deleting": "", "deleting_at": ""}, "$setOnInsert": {"key": key, "size": spooled.size, "created_at": datetime.utcnow()}},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE,
+                )
+                break
+            except DuplicateKeyError:
+                # Tombstoned: wait for release_blob to finish deleting the file
+                await asyncio.sleep(0.05)
+    except BaseException:
+        await storage.abort(spooled.handle)
+        raise
+    if previous is not None and "deleting" not in previous:
+        # Duplicate content: drop the spooled copy and reference the existing blob
+        await storage.abort(spooled.handle)
+        return StoredObject(key=key, url=storage.url(key), size=spooled.size, sha256=spooled.sha256)
+    try:
+        url = await storage.commit(spooled.handle, key)
+    except BaseException:
+        await storage.abort(spooled.handle)
+        await release_blob(spooled.sha256, delete_file=False)
+        raise
+    return StoredObject(key=key, url=url, size=spooled.size, sha256=spooled.sha256)
+
+async def release_blob(sha256: str, delete_file: bool = True) -> None:
+    db = await get_db()
+    await db[BLOB_COLLECTION].update_one({"_id": sha256}, {"$inc": {"refs": -1}})
+    if not delete_file:
+        await db[BLOB_COLLECTION].delete_one({"_id": sha256, "refs": {"$lte": 0}, "deleting": {"$exists": False}})
+        return
+    token = uuid.uuid4().hex
+    orphan = await db[BLOB_COLLECTION].find_one_and_update(
+        {"_id": sha256, "refs": {"$lte": 0}, "deleting": {"$exists": False}},
+        {"$set": {"deleting": token, "deleting_at": datetime.utcnow()}},
+    )
+    if orphan:
+        await get_storage().delete(orphan["key"])
+        await db[BLOB_COLLECTION].delete_one({"_id": sha256, "deleting": token})
@@ -0,0 +1,302 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Prometheus text exposition for in-process counters. Only depends on pymongo
+# so the root database.py can attach the same Mongo listeners.
+
+MONGO_SLOW_MS = float(os.getenv("MONGO_SLOW_MS", "100"))
+MONGO_SLOW_SHAPES = int(os.getenv("MONGO_SLOW_SHAPES", "50"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _label_str(labels: Labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts, then sum and count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, const: Labels = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, values in sorted(series.items()):
+            labels = const + labels
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(labels + (('le', _fmt(bound)),))} {_fmt(cumulative)}")
+            lines.append(f"{self.name}_bucket{_label_str(labels + (('le', '+Inf'),))} {_fmt(values[-1])}")
+            lines.append(f"{self.name}_sum{_label_str(labels)} {values[-2]!r}")
+            lines.append(f"{self.name}_count{_label_str(labels)} {_fmt(values[-1])}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def drop(self, **labels: str) -> None:
+        with self._lock:
+            self._series.pop(tuple(sorted(labels.items())), None)
+
+    def render(self, const: Labels = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{self.name}{_label_str(const + labels)} {_fmt(value)}")
+        return lines
+
+class MaxGauge(Counter):
+    def update(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = max(self._series.get(key, 0), value)
+
+    def render(self, const: Labels = ()) -> List[str]:
+        lines = super().render(const)
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Gauges:
+    """Values read at scrape time from a callback returning {name: value}."""
+
+    def __init__(self, prefix: str, help: str, collect: Callable[[], Dict[str, float]]):
+        self.prefix = prefix
+        self.help = help
+        self.collect = collect
+
+    def render(self, const: Labels = ()) -> List[str]:
+        lines = []
+        for key, value in self.collect().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines += [f"# HELP {name} {self.help}", f"# TYPE {name} gauge", f"{name}{_label_str(const)} {_fmt(value)}"]
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, object]" = OrderedDict()
+
+    def register(self, metric):
+        # Re-registering a name replaces it, so modules can be reloaded
+        self._metrics[getattr(metric, "name", None) or metric.prefix] = metric
+        return metric
+
+    def render(self) -> str:
+        # Every process keeps its own series. The worker label (the pid, read
+        # here so forked workers report their own) keeps them apart when a
+        # scrape through a load balancer lands on a different worker each time.
+        const = (("worker", str(os.getpid())),)
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render(const))
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# Commands whose collection is not the value of the command-name key
+_COLLECTION_KEYS = {"getMore": "collection"}
+# Envelope fields that say nothing about the query
+_SHAPE_SKIP = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "apiVersion", "cursor", "batchSize", "readConcern", "writeConcern"}
+
+def query_shape(value, depth: int = 0):
+    # Keys and operators are kept; literal values are replaced by their type
+    # so the shape is safe to export and groups commands differing only in values.
+    if depth > 6:
+        return "..."
+    if isinstance(value, dict):
+        return {k: query_shape(v, depth + 1) for k, v in value.items() if depth or k not in _SHAPE_SKIP}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0], depth + 1)] if value else []
+    return type(value).__name__
+
+def _shape_str(command: dict, command_name: str) -> str:
+    shape = query_shape(command)
+    # The command key carries the collection name, which is already a label
+    shape.pop(command_name, None)
+    return str(shape).replace("'", "")
+
+class CommandMetrics(monitoring.CommandListener):
+    """Latency per collection and command, failures, and a bounded set of
+    slow query shapes. Started events are kept only until their reply."""
+
+    def __init__(self, registry: Registry, slow_ms: float = MONGO_SLOW_MS, max_shapes: int = MONGO_SLOW_SHAPES):
+        self.latency = registry.register(Histogram("mongo_command_duration_seconds", "Server round-trip time of Mongo commands"))
+        self.failures = registry.register(Counter("mongo_command_failures_total", "Mongo commands that returned an error"))
+        self.slow = registry.register(Counter("mongo_slow_commands_total", f"Mongo commands slower than {slow_ms:g}ms, by query shape"))
+        self.slow_max = registry.register(MaxGauge("mongo_slow_command_max_seconds", "Slowest observed duration per slow query shape"))
+        self.slow_seconds = slow_ms / 1000
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[int, object], Tuple[str, dict]] = {}
+        self._shapes: "OrderedDict[Tuple[str, str, str], None]" = OrderedDict()
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get(_COLLECTION_KEYS.get(name, name))
+        with self._lock:
+            self._inflight[(event.request_id, event.connection_id)] = (collection if isinstance(collection, str) else "", event.command)
+
+    def _finish(self, event) -> Optional[Tuple[str, dict]]:
+        with self._lock:
+            return self._inflight.pop((event.request_id, event.connection_id), None)
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed: bool):
+        started = self._finish(event)
+        if started is None:
+            return
+        collection, command = started
+        seconds = event.duration_micros / 1e6
+        labels = {"collection": collection, "command": event.command_name}
+        self.latency.observe(seconds, **labels)
+        if failed:
+            self.failures.inc(**labels)
+        if seconds >= self.slow_seconds and collection:
+            shape = _shape_str(command, event.command_name)
+            with self._lock:
+                key = (collection, event.command_name, shape)
+                self._shapes[key] = None
+                self._shapes.move_to_end(key)
+                evicted = self._shapes.popitem(last=False)[0] if len(self._shapes) > self.max_shapes else None
+            if evicted is not None:
+                old = dict(zip(("collection", "command", "shape"), evicted))
+                self.slow.drop(**old)
+                self.slow_max.drop(**old)
+            self.slow.inc(shape=shape, **labels)
+            self.slow_max.update(seconds, shape=shape, **labels)
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters fed by the driver's CMAP events, plus how long
+    each checkout waited. Events arrive on driver threads, hence the lock;
+    a checkout starts and completes on the same thread."""
+
+    def __init__(self, registry: Registry):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.wait = registry.register(Histogram("mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"))
+        registry.register(Gauges("mongo_pool", "Mongo connection pool state", self.stats))
+
+    def _bump(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _waited(self) -> None:
+        start = getattr(self._local, "start", None)
+        if start is not None:
+            self._local.start = None
+            self.wait.observe(time.perf_counter() - start)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): self._bump(pool_clears=1)
+    def pool_closed(self, event): pass
+    def connection_created(self, event): self._bump(created=1)
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): self._bump(closed=1)
+
+    def connection_check_out_started(self, event):
+        self._local.start = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        self._bump(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._waited()
+        self._bump(checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event): self._bump(checked_out=-1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+class RequestTimer:
+    """ASGI middleware timing each request, body included, by route template."""
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.histogram.observe(time.perf_counter() - start, method=scope["method"], route=route)
+
+# One set of listeners per process, shared by every client that attaches them
+command_metrics = CommandMetrics(registry)
+pool_stats = PoolStats(registry)
+
+def mongo_listeners() -> list:
+    return [command_metrics, pool_stats]
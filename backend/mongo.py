@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metrics import mongo_listeners
+
+# The process-wide Mongo client. The app's database module and the root
+# database helpers both take it from here, so a process opens one pool; the
+# root sync facade talks to the PyMongo client Motor wraps, same pool again.
+
+MONGO_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
+
+# Pool sizing is per process; with several web workers the server sees
+# workers * MONGO_MAX_POOL_SIZE connections at most.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# A request waiting longer than this for a free connection fails instead of queueing forever
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_client() -> AsyncIOMotorClient:
+    # Creating the client opens no connections and needs no running loop
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            event_listeners=mongo_listeners(),
+        )
+    return _client
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = None
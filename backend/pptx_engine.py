@@ -0,0 +1,112 @@
+import io
+import os
+import re
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from pptx import Presentation
+from pptx.util import Inches
+
+from zipstream import ZipSink
+
+# PPTX export without rebuilding a Presentation per call. The base package is
+# produced once per process by python-pptx (one 'Title Only' slide with the
+# same textbox build_pptx adds); its parts are reused verbatim and only the
+# slide parts plus the slide lists are generated for each export.
+
+PPTX_FRAGMENT_CACHE = int(os.getenv("PPTX_FRAGMENT_CACHE", "4096"))
+
+_MARKER = "__SLIDE_TEXT__"
+_SLIDE_PART = "ppt/slides/slide1.xml"
+_SLIDE_RELS_PART = "ppt/slides/_rels/slide1.xml.rels"
+_SLIDE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+_SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+# Characters XML 1.0 cannot carry; python-pptx rejects them too
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+class PptxTemplate:
+    def __init__(self):
+        prs = Presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        txBox = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(8), Inches(5))
+        txBox.text_frame.text = _MARKER
+        buf = io.BytesIO()
+        prs.save(buf)
+        with ZipFile(buf) as z:
+            parts: Dict[str, bytes] = {name: z.read(name) for name in z.namelist()}
+
+        slide_xml = parts.pop(_SLIDE_PART).decode("utf-8")
+        marker_p = f"<a:p><a:r><a:t>{_MARKER}</a:t></a:r></a:p>"
+        self._slide_head, self._slide_tail = slide_xml.split(marker_p)
+        self.slide_rels = parts.pop(_SLIDE_RELS_PART)
+
+        pres_rels = parts.pop("ppt/_rels/presentation.xml.rels").decode("utf-8")
+        slide_rel = re.search(r'<Relationship Id="(rId\d+)" Type="%s" Target="slides/slide1.xml"/>' % re.escape(_SLIDE_REL_TYPE), pres_rels)
+        self._first_rid = int(slide_rel.group(1)[3:])
+        self._pres_rels_head, self._pres_rels_tail = pres_rels.replace(slide_rel.group(0), "").split("</Relationships>")
+
+        presentation = parts.pop("ppt/presentation.xml").decode("utf-8")
+        self._pres_head, rest = presentation.split("<p:sldIdLst>")
+        self._pres_tail = rest.split("</p:sldIdLst>", 1)[1]
+
+        content_types = parts.pop("[Content_Types].xml").decode("utf-8")
+        override = f'<Override PartName="/{_SLIDE_PART}" ContentType="{_SLIDE_CONTENT_TYPE}"/>'
+        self._types_head, self._types_tail = content_types.replace(override, "").split("</Types>")
+
+        self._app = parts.pop("docProps/app.xml").decode("utf-8")
+        self.parts = parts
+
+    @lru_cache(maxsize=PPTX_FRAGMENT_CACHE)
+    def slide_xml(self, text: str) -> bytes:
+        # Cached per distinct slide text, which is all that varies between slides
+        paragraphs = []
+        for line in _INVALID_XML.sub("", text).split("\n"):
+            paragraphs.append(f"<a:p><a:r><a:t>{escape(line)}</a:t></a:r></a:p>" if line else "<a:p/>")
+        return (self._slide_head + "".join(paragraphs) + self._slide_tail).encode("utf-8")
+
+    def _package_parts(self, count: int) -> Dict[str, bytes]:
+        rids = [f"rId{self._first_rid + i}" for i in range(count)]
+        sld_ids = "".join(f'<p:sldId id="{256 + i}" r:id="{rid}"/>' for i, rid in enumerate(rids))
+        rels = "".join(f'<Relationship Id="{rid}" Type="{_SLIDE_REL_TYPE}" Target="slides/slide{i}.xml"/>' for i, rid in enumerate(rids, start=1))
+        overrides = "".join(f'<Override PartName="/ppt/slides/slide{i}.xml" ContentType="{_SLIDE_CONTENT_TYPE}"/>' for i in range(1, count + 1))
+        return {
+            "[Content_Types].xml": (self._types_head + overrides + "</Types>" + self._types_tail).encode("utf-8"),
+            "docProps/app.xml": re.sub(r"<Slides>\d+</Slides>", f"<Slides>{count}</Slides>", self._app).encode("utf-8"),
+            "ppt/presentation.xml": (self._pres_head + f"<p:sldIdLst>{sld_ids}</p:sldIdLst>" + self._pres_tail).encode("utf-8"),
+            "ppt/_rels/presentation.xml.rels": (self._pres_rels_head + rels + "</Relationships>" + self._pres_rels_tail).encode("utf-8"),
+        }
+
+    def iter_package(self, slides: List[dict], fileobj: BinaryIO) -> Iterator[int]:
+        # Writes the package into fileobj, yielding after each slide part so a
+        # caller can flush what has been written so far.
+        with ZipFile(fileobj, "w", ZIP_DEFLATED) as zipf:
+            for name, data in self._package_parts(len(slides)).items():
+                zipf.writestr(name, data)
+            for name, data in self.parts.items():
+                zipf.writestr(name, data)
+            for idx, s in enumerate(slides, start=1):
+                zipf.writestr(f"ppt/slides/slide{idx}.xml", self.slide_xml(s.get("text", f"Slide {idx}")))
+                zipf.writestr(f"ppt/slides/_rels/slide{idx}.xml.rels", self.slide_rels)
+                yield idx
+
+_template: Optional[PptxTemplate] = None
+
+def get_template() -> PptxTemplate:
+    global _template
+    if _template is None:
+        _template = PptxTemplate()
+    return _template
+
+def write_pptx(slides: List[dict], path: str) -> None:
+    # Runs in the export process pool; writes straight to the artifact file
+    with open(path, "wb") as f:
+        for _ in get_template().iter_package(slides, f):
+            pass
+
+def iter_pptx(slides: List[dict]) -> Iterator[bytes]:
+    sink = ZipSink()
+    for _ in get_template().iter_package(slides, sink):
+        yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,30 @@
+import io
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw
+
+# Pure, picklable render functions: they run inside the export process pool.
+
+CANVAS_SIZE = (1080, 1920)
+# Anything that changes rendered output must be reflected here; it is part of
+# the rendered-slide cache key. Bump the version when drawing code changes.
+RENDER_SETTINGS = {"size": CANVAS_SIZE, "format": "PNG", "text_origin": (50, 50), "version": 1}
+
+def render_slide(slide: dict, idx: int) -> Image.Image:
+    img = Image.new('RGB', CANVAS_SIZE, color=slide.get('bg', '#111827'))
+    draw = ImageDraw.Draw(img)
+    text = slide.get('text', f'Slide {idx}')
+    draw.text((50, 50), text, fill=slide.get('color', '#ffffff'))
+    return img
+
+def render_png(slide: dict, idx: int) -> bytes:
+    buf = io.BytesIO()
+    render_slide(slide, idx).save(buf, format='PNG')
+    return buf.getvalue()
+
+def render_png_batch(batch: List[Tuple[int, dict]]) -> List[bytes]:
+    return [render_png(slide, idx) for idx, slide in batch]
+
+def render_raw_batch(batch: List[Tuple[int, dict]]) -> List[bytes]:
+    # Packed rgb24 frames for the video encoder
+    return [render_slide(slide, idx).tobytes() for idx, slide in batch]
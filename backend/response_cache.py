@@ -0,0 +1,130 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# The in-process tier is only coherent inside one process: an invalidation
+# handled by one worker never reaches another worker's memory. When the
+# server runs several workers (WEB_WORKERS, set by serve.py) every hit is
+# therefore revalidated with an _id lookup of the stored stamp (updated_at
+# and version) before it is served, which is still far cheaper than reading
+# and serializing the document. Other multi-process setups, such as uvicorn
+# --workers, must set RESPONSE_CACHE_REVALIDATE=1 themselves.
+RESPONSE_CACHE_LOCAL = os.getenv("RESPONSE_CACHE_LOCAL", "1") == "1"
+RESPONSE_CACHE_REVALIDATE = os.getenv("RESPONSE_CACHE_REVALIDATE", "1" if int(os.getenv("WEB_WORKERS") or "1") > 1 else "0") == "1"
+
+@dataclass
+class CachedResponse:
+    etag: str
+    body: bytes
+    # Principals allowed to read the body; checked on every hit
+    acl: Tuple[str, ...] = ()
+    # What the body was built from; compared on revalidation
+    stamp: Any = None
+
+class CacheBackend(ABC):
+    """Key/value store for serialized responses. MemoryCache is the in-process
+    tier; a shared implementation (e.g. Redis) can be plugged in as the
+    second tier so workers share hits."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    # Values are opaque here; the share-token cache stores its own records
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+class NullCache(CacheBackend):
+    # Stands in for the local tier when it is turned off
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+class ResponseCache:
+    """Local tier in front of an optional shared one. Invalidation deletes
+    from both, but the version guard below is per process, so a shared tier
+    can still be refilled by a read that started in another worker before
+    the write; keep its TTL short."""
+
+    def __init__(self, local: Optional[CacheBackend] = None, shared: Optional[CacheBackend] = None, ttl: float = RESPONSE_CACHE_TTL, revalidate: bool = RESPONSE_CACHE_REVALIDATE):
+        self.local = local or MemoryCache()
+        self.shared = shared
+        self.ttl = ttl
+        # Callers check each hit's stamp against the source before using it
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation. A reader records it before going to
+        # Mongo and only stores its result if nothing was invalidated in the
+        # meantime, so a slow read can never re-cache a superseded version.
+        self._version = 0
+
+    def version(self) -> int:
+        return self._version
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        value = await self.local.get(key)
+        if value is None and self.shared is not None:
+            value = await self.shared.get(key)
+            if value is not None:
+                await self.local.set(key, value, self.ttl)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def put(self, key: str, value: CachedResponse, version: int) -> None:
+        if version != self._version:
+            return
+        await self.local.set(key, value, self.ttl)
+        if self.shared is not None:
+            await self.shared.set(key, value, self.ttl)
+
+    async def invalidate(self, key: str) -> None:
+        self._version += 1
+        await self.local.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+
+project_cache = ResponseCache(local=MemoryCache() if RESPONSE_CACHE_LOCAL else NullCache())
@@ -1,6 +1,7 @@
 from typing import List, Optional, Literal
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 # Each class maps to a Mongo collection: class name lowercased
 
@@ -23,9 +24,50 @@ class Project(BaseModel):
     theme_id: Optional[str] = None
     slides: List[dict] = []
     collaborators: List[str] = []
+    # Bumped by every write; slide edits must name the version they were made against
+    version: int = 0
+    # Read-only. When slides live in the slide collection, reads return the
+    # first few in 'slides' and the full count here.
+    slide_count: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ProjectListItem(BaseModel):
+    # Partial Project returned by GET /projects when fields= or summary is used
+    id: str
+    owner_id: Optional[str] = None
+    title: Optional[str] = None
+    date: Optional[str] = None
+    location: Optional[str] = None
+    platform: Optional[str] = None
+    mood: Optional[str] = None
+    theme_id: Optional[str] = None
+    slides: Optional[List[dict]] = None
+    slide_count: Optional[int] = None
+    collaborators: Optional[List[str]] = None
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# Slide edits address slides by their server-assigned 'id' and carry the
+# project version they were made against
+class SlidePatch(BaseModel):
+    version: int
+    changes: dict
+
+class SlideInsert(BaseModel):
+    version: int
+    slide: dict = {}
+    index: Optional[int] = None  # default: append
+
+class SlideOrder(BaseModel):
+    version: int
+    order: List[str]
+
+class SlideWrite(BaseModel):
+    version: int
+    slide_id: Optional[str] = None
+
 class MediaAsset(BaseModel):
     id: Optional[str] = None
     owner_id: str
@@ -33,8 +75,21 @@ class MediaAsset(BaseModel):
     url: str
     type: Literal['image', 'video']
     name: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class MediaAssetListItem(BaseModel):
+    id: str
+    owner_id: Optional[str] = None
+    project_id: Optional[str] = None
+    url: Optional[str] = None
+    type: Optional[Literal['image', 'video']] = None
+    name: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class ShareLink(BaseModel):
     id: Optional[str] = None
     project_id: str
@@ -51,3 +106,70 @@ class AuthPayload(BaseModel):
 class SlideExportRequest(BaseModel):
     project_id: str
     format: Literal['images', 'video', 'pptx'] = 'images'
+
+class ExportJob(BaseModel):
+    id: Optional[str] = None
+    project_id: str
+    owner_id: Optional[str] = None  # requesting user; only they can see or download the job
+    format: Literal['images', 'video', 'pptx']
+    status: Literal['queued', 'running', 'done', 'failed'] = 'queued'
+    progress: int = 0
+    total: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    error: Optional[str] = None
+    artifact: Optional[str] = None
+    download_url: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    heartbeat_at: Optional[datetime] = None
+
+# Indexes required by the API's query patterns, keyed by collection name.
+# Created idempotently at startup by database.ensure_indexes().
+INDEXES = {
+    # Building email_unique fails, and startup with it, while duplicate emails
+    # exist. Before deploying against older data, find them with
+    #   db.user.aggregate([{$group: {_id: "$email", n: {$sum: 1}, ids: {$push: "$_id"}}}, {$match: {n: {$gt: 1}}}])
+    # and merge or remove the extra accounts.
+    "user": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    # Compound keys end in the pagination sort so list pages are index range scans
+    "project": [
+        IndexModel([("owner_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="owner_id_updated_at"),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated_at"),
+        # Backups walk a user's projects in _id order
+        IndexModel([("owner_id", ASCENDING), ("_id", ASCENDING)], name="owner_id_id"),
+    ],
+    "mediaasset": [
+        IndexModel([("owner_id", ASCENDING), ("_id", DESCENDING)], name="owner_id_id"),
+        IndexModel([("owner_id", ASCENDING), ("project_id", ASCENDING), ("_id", DESCENDING)], name="owner_id_project_id_id"),
+        IndexModel([("project_id", ASCENDING), ("_id", DESCENDING)], name="project_id_id"),
+    ],
+    "sharelink": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        # Mongo's TTL monitor deletes links once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # Slides stored outside the project document, read in order per project
+    "slide": [
+        IndexModel([("project_id", ASCENDING), ("order", ASCENDING), ("_id", ASCENDING)], name="project_id_order"),
+    ],
+    "exportjob": [
+        IndexModel([("status", ASCENDING), ("heartbeat_at", ASCENDING)], name="status_heartbeat_at"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+    ],
+}
+
+# Hot query shapes that must never fall back to a collection scan; checked
+# with explain() by database.check_query_plans().
+HOT_QUERIES = [
+    ("user", {"email": "probe@example.com"}),
+    ("project", {"owner_id": "probe"}),
+    ("project", {"id": "000000000000000000000000"}),
+    ("mediaasset", {"owner_id": "probe"}),
+    ("mediaasset", {"owner_id": "probe", "project_id": "probe"}),
+    ("mediaasset", {"project_id": "probe"}),
+    ("sharelink", {"token": "probe"}),
+    ("slide", {"project_id": "probe"}),
+]
@@ -0,0 +1,41 @@
+import os
+from typing import Any, Dict, List, Optional, Type, Union
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+# Opt-in: documents read back from Mongo were validated on the way in, so
+# handlers can send them straight to the encoder instead of building Pydantic
+# models and having FastAPI validate them again against response_model.
+TRUST_DB_OUTPUT = os.getenv("TRUST_DB_OUTPUT", "0") == "1"
+
+def pick(model: Type[BaseModel], doc: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape as the model (unknown keys dropped, absent keys left out)
+    return {k: doc[k] for k in model.__fields__ if k in doc}
+
+def dumps(model: Type[BaseModel], doc: Dict[str, Any]) -> bytes:
+    if TRUST_DB_OUTPUT and orjson is not None:
+        return orjson.dumps(pick(model, doc))
+    return model(**doc).json().encode()
+
+def db_response(model: Type[BaseModel], data: Union[Dict[str, Any], List[Dict[str, Any]]], response: Optional[Response] = None):
+    """Response for documents read from Mongo: a model (validated by FastAPI
+    as before) or, with TRUST_DB_OUTPUT, a response that skips Pydantic.
+    Headers set on the handler's injected `response` are carried over."""
+    if not TRUST_DB_OUTPUT:
+        return [model(**d) for d in data] if isinstance(data, list) else model(**data)
+    content = [pick(model, d) for d in data] if isinstance(data, list) else pick(model, data)
+    if orjson is None:
+        # The stdlib encoder behind JSONResponse can't take datetimes
+        content = jsonable_encoder(content)
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"} if response is not None else None
+    return FastJSONResponse(content, headers=headers)
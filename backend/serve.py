@@ -0,0 +1,67 @@
+"""Production entry point: python serve.py
+
+Runs uvicorn workers under gunicorn. The app is imported in the master before
+forking so workers share its memory copy-on-write; each worker then opens its
+own Mongo client and export pool from the startup hook. SIGTERM lets open
+requests and in-flight exports finish before workers exit.
+"""
+import importlib.util
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0")) or (os.cpu_count() or 1)
+KEEPALIVE_SECONDS = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+
+# Read by modules whose in-process state must be revalidated across workers
+os.environ["WEB_WORKERS"] = str(WEB_WORKERS)
+
+# Every worker runs its own export pool; split the cores between them unless
+# configured explicitly. Must be set before the app modules are imported.
+os.environ.setdefault("EXPORT_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+
+from exports import EXPORT_DRAIN_SECONDS  # noqa: E402
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "lifespan": "on",
+    }
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import main
+        # Build per-process singletons before fork so workers inherit them
+        from pptx_engine import get_template
+        get_template()
+        return main.app
+
+def options() -> dict:
+    return {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_WORKERS,
+        "worker_class": "serve.Worker",
+        "preload_app": True,
+        "keepalive": KEEPALIVE_SECONDS,
+        "backlog": BACKLOG,
+        # Covers the export drain in the shutdown hook plus closing connections
+        "graceful_timeout": int(EXPORT_DRAIN_SECONDS) + 15,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+if __name__ == "__main__":
+    Server(options()).run()
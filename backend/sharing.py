@@ -0,0 +1,59 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from database import aggregate_one, to_public
+from response_cache import MemoryCache
+
+SHARE_CACHE_TTL = float(os.getenv("SHARE_CACHE_TTL", "60"))
+# Unknown tokens are remembered briefly so scans and dead links skip Mongo
+SHARE_NEGATIVE_TTL = float(os.getenv("SHARE_NEGATIVE_TTL", "10"))
+SHARE_CACHE_MAX_ENTRIES = int(os.getenv("SHARE_CACHE_MAX_ENTRIES", "50000"))
+
+@dataclass
+class ShareGrant:
+    project_id: str
+    role: str
+    expires_at: Optional[datetime] = None
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+class ShareResolver:
+    def __init__(self, max_entries: int = SHARE_CACHE_MAX_ENTRIES):
+        self._cache = MemoryCache(max_entries)
+
+    async def resolve(self, token: str) -> Tuple[Optional[ShareGrant], Optional[dict]]:
+        """Returns the grant for a token and, on a cache miss, the project
+        fetched alongside it so the caller does not need a second query."""
+        cached = await self._cache.get(token)
+        if cached is False:
+            return None, None
+        if cached is not None:
+            return cached, None
+        # Link and project in one round trip. A plain localField/foreignField
+        # lookup, unlike $expr in a sub-pipeline, uses the _id index on any
+        # server version, so the id is converted in a stage of its own.
+        doc = await aggregate_one("sharelink", [
+            {"$match": {"token": token}},
+            {"$addFields": {"project_oid": {"$convert": {"input": "$project_id", "to": "objectId", "onError": None, "onNull": None}}}},
+            {"$lookup": {"from": "project", "localField": "project_oid", "foreignField": "_id", "as": "project"}},
+            {"$project": {"project_oid": 0}},
+        ])
+        if doc is None:
+            await self._cache.set(token, False, SHARE_NEGATIVE_TTL)
+            return None, None
+        grant = ShareGrant(project_id=doc["project_id"], role=doc.get("role", "viewer"), expires_at=doc.get("expires_at"))
+        ttl = SHARE_CACHE_TTL
+        if grant.expires_at is not None:
+            ttl = min(ttl, max(0.0, (grant.expires_at - datetime.utcnow()).total_seconds()))
+        if ttl > 0:
+            await self._cache.set(token, grant, ttl)
+        project = doc["project"][0] if doc.get("project") else None
+        return grant, to_public(project) if project else None
+
+    async def forget(self, token: str) -> None:
+        await self._cache.delete(token)
+
+share_resolver = ShareResolver()
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from render import RENDER_SETTINGS
+
+SLIDE_CACHE_DIR = os.getenv("SLIDE_CACHE_DIR", "cache/slides")
+SLIDE_CACHE_MAX_BYTES = int(os.getenv("SLIDE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# In-memory tier in front of the disk cache; 0 disables it
+SLIDE_CACHE_MEMORY_BYTES = int(os.getenv("SLIDE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+
+def slide_key(slide: dict, idx: int) -> str:
+    # Only the fields that affect the rendered pixels, plus the render settings
+    content = {
+        "bg": slide.get("bg", "#111827"),
+        "color": slide.get("color", "#ffffff"),
+        "text": slide.get("text", f"Slide {idx}"),
+        "settings": RENDER_SETTINGS,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+class _LRUBytes:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+
+    def touch(self, key: str) -> bool:
+        if key not in self._entries:
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def add(self, key: str, nbytes: int) -> list:
+        # Returns the evicted keys
+        if key in self._entries:
+            self.size -= self._entries.pop(key)
+        self._entries[key] = nbytes
+        self.size += nbytes
+        evicted = []
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            old, old_size = self._entries.popitem(last=False)
+            self.size -= old_size
+            evicted.append(old)
+        return evicted
+
+    def discard(self, key: str) -> None:
+        if key in self._entries:
+            self.size -= self._entries.pop(key)
+
+class SlideCache:
+    """Rendered PNGs keyed by slide content hash: an optional in-memory LRU tier
+    over an on-disk LRU bounded by total size."""
+
+    def __init__(self, root: str = SLIDE_CACHE_DIR, max_bytes: int = SLIDE_CACHE_MAX_BYTES, memory_bytes: int = SLIDE_CACHE_MEMORY_BYTES):
+        self.root = root
+        self._disk = _LRUBytes(max_bytes)
+        self._memory = _LRUBytes(memory_bytes) if memory_bytes > 0 else None
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".png")
+
+    def _load_index(self) -> None:
+        # Rebuild LRU order from file access times left by previous processes
+        entries = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".png"):
+                    try:
+                        st = os.stat(os.path.join(dirpath, name))
+                    except FileNotFoundError:
+                        continue  # evicted by another process meanwhile
+                    entries.append((st.st_atime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            for old in self._disk.add(key, size):
+                self._remove_file(old)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if self._memory is None:
+            return
+        self._blobs[key] = data
+        for old in self._memory.add(key, len(data)):
+            self._blobs.pop(old, None)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if self._memory is not None and self._memory.touch(key):
+                self.hits += 1
+                return self._blobs[key]
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._disk.discard(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._disk.add(key, len(data))
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            evicted = self._disk.add(key, len(data))
+            self._remember(key, data)
+        for old in evicted:
+            self._remove_file(old)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self.put, key, data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_bytes": self._disk.size,
+            "memory_bytes": self._memory.size if self._memory is not None else 0,
+        }
+
+_cache: Optional[SlideCache] = None
+
+def get_slide_cache() -> SlideCache:
+    global _cache
+    if _cache is None:
+        _cache = SlideCache()
+    return _cache
+
+async def open_slide_cache() -> SlideCache:
+    # Loading the index stats every cached file; the app does it at startup,
+    # off the event loop, so get_slide_cache() never blocks a request
+    global _cache
+    if _cache is None:
+        cache = await asyncio.to_thread(SlideCache)
+        _cache = _cache or cache
+    return _cache
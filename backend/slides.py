@@ -0,0 +1,271 @@
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from database import apply_update, get_db, get_document, get_page, to_object_id, to_public
+
+# Slide-granular edits. Each one is a conditional update guarded by the
+# project's version, so what is written scales with the edit rather than the
+# project, and a stale editor gets a 409 instead of overwriting someone
+# else's change.
+#
+# Slides are either embedded in the project document (positional $set, $push
+# with $position, $pull, or a pipeline for reorders) or, for projects created
+# with SLIDE_STORAGE=collection, stored one document each in the slide
+# collection ordered by a sparse 'order' key. There the version bump on the
+# project claims the edit and the slide write follows; a failure in between
+# only costs the client a reload.
+
+SLIDE_COLLECTION = "slide"
+# Storage mode for new projects; existing projects keep the mode they were created with
+SLIDE_STORAGE = os.getenv("SLIDE_STORAGE", "embedded")  # 'embedded' or 'collection'
+SLIDE_PREVIEW_COUNT = int(os.getenv("SLIDE_PREVIEW_COUNT", "12"))
+SLIDE_CURSOR_BATCH = int(os.getenv("SLIDE_CURSOR_BATCH", "100"))
+# Spacing between order keys, so inserts rarely need a renumber
+ORDER_GAP = 1024.0
+
+def new_slide_id() -> str:
+    return str(ObjectId())
+
+def ensure_slide_ids(slides: List[dict]) -> List[dict]:
+    return [s if s.get("id") else {**s, "id": new_slide_id()} for s in slides]
+
+def fresh_slide_ids(slides: List[dict]) -> List[dict]:
+    # Collection-mode slides are keyed by a global _id, so ids sent by the
+    # client (a copied project's, or ones that aren't ObjectIds) are replaced
+    return [{**s, "id": new_slide_id()} for s in slides]
+
+def is_external(proj: dict) -> bool:
+    return proj.get("slide_storage") == "collection"
+
+def _public_slide(doc: dict) -> dict:
+    slide = to_public(doc)
+    slide.pop("project_id", None)
+    slide.pop("order", None)
+    return slide
+
+def _version_filter(version: int) -> dict:
+    # Projects written before versioning have no field; they count as 0
+    return {"$in": [0, None]} if version == 0 else version
+
+def _check_changes(changes: dict) -> None:
+    bad = [k for k in changes if not k or k in ("id", "_id", "project_id", "order") or "." in k or k.startswith("$")]
+    if bad or not changes:
+        raise HTTPException(status_code=400, detail=f"Invalid slide fields: {', '.join(bad) or '(none)'}")
+
+async def _explain_miss(project_id: str, owner_id: str, version: int, slide_id: Optional[str] = None) -> None:
+    # The guarded update matched nothing; work out why for the caller.
+    # Returns only for a collection-mode project at the expected version.
+    proj = await get_document("project", {"id": project_id, "owner_id": owner_id})
+    if not proj:
+        raise HTTPException(status_code=404, detail="Project not found")
+    current = proj.get("version", 0)
+    if is_external(proj):
+        if current != version:
+            raise HTTPException(status_code=409, detail={"message": "Project was modified", "version": current})
+        return
+    slides = proj.get("slides") or []
+    if any(not s.get("id") for s in slides):
+        # Slides saved before ids existed: assign them once, then make the
+        # client refetch so it can address them
+        done = await apply_update("project", {"id": project_id, "version": _version_filter(current)},
+                                  {"$set": {"slides": ensure_slide_ids(slides)}, "$inc": {"version": 1}}, projection={"version": 1})
+        current = done["version"] if done else current + 1
+        raise HTTPException(status_code=409, detail={"message": "Slide ids were assigned; reload the project", "version": current})
+    if current != version:
+        raise HTTPException(status_code=409, detail={"message": "Project was modified", "version": current})
+    if slide_id is not None and not any(s.get("id") == slide_id for s in slides):
+        raise HTTPException(status_code=404, detail="Slide not found")
+    raise HTTPException(status_code=400, detail="Slide order must list every slide exactly once")
+
+async def _apply(project_id: str, owner_id: str, version: int, update, extra_filter: Optional[dict] = None, slide_id: Optional[str] = None) -> Optional[int]:
+    # Embedded mode; None means the project keeps its slides in the collection
+    filt = {"id": project_id, "owner_id": owner_id, "version": _version_filter(version), "slide_storage": {"$ne": "collection"}, **(extra_filter or {})}
+    if isinstance(update, dict):
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        update["$inc"] = {"version": 1}
+    doc = await apply_update("project", filt, update, projection={"version": 1})
+    if doc is None:
+        await _explain_miss(project_id, owner_id, version, slide_id)
+        return None
+    return doc["version"]
+
+async def _claim(project_id: str, owner_id: str, version: int, count_delta: int = 0) -> int:
+    inc = {"version": 1}
+    if count_delta:
+        inc["slide_count"] = count_delta
+    doc = await apply_update("project", {"id": project_id, "owner_id": owner_id, "version": _version_filter(version), "slide_storage": "collection"},
+                             {"$set": {"updated_at": datetime.utcnow()}, "$inc": inc}, projection={"version": 1})
+    if doc is None:
+        await _explain_miss(project_id, owner_id, version)
+        raise HTTPException(status_code=409, detail={"message": "Project was modified", "version": None})
+    return doc["version"]
+
+def _slide_filter(project_id: str, slide_id: str) -> dict:
+    return {"_id": to_object_id(slide_id), "project_id": project_id}
+
+async def patch_slide(project_id: str, owner_id: str, slide_id: str, version: int, changes: dict) -> int:
+    _check_changes(changes)
+    update = {"$set": {f"slides.$.{k}": v for k, v in changes.items()}}
+    new_version = await _apply(project_id, owner_id, version, update, {"slides.id": slide_id}, slide_id)
+    if new_version is not None:
+        return new_version
+    db = await get_db()
+    if not await db[SLIDE_COLLECTION].count_documents(_slide_filter(project_id, slide_id), limit=1):
+        raise HTTPException(status_code=404, detail="Slide not found")
+    new_version = await _claim(project_id, owner_id, version)
+    await db[SLIDE_COLLECTION].update_one(_slide_filter(project_id, slide_id), {"$set": changes})
+    return new_version
+
+async def _order_at(project_id: str, index: Optional[int], count: int) -> float:
+    # Order key for a slide inserted before position `index` (None appends)
+    db = await get_db()
+    coll = db[SLIDE_COLLECTION]
+    if index is None or index >= count:
+        last = await coll.find({"project_id": project_id}, {"order": 1}).sort("order", -1).limit(1).to_list(1)
+        return (last[0]["order"] + ORDER_GAP) if last else 0.0
+    if index < 0:
+        index = max(0, count + index)
+    around = await coll.find({"project_id": project_id}, {"order": 1}).sort([("order", 1), ("_id", 1)]).skip(max(0, index - 1)).limit(2).to_list(2)
+    if index == 0:
+        return around[0]["order"] - ORDER_GAP if around else 0.0
+    before, after = around[0]["order"], around[1]["order"] if len(around) > 1 else around[0]["order"] + 2 * ORDER_GAP
+    if after - before > 1e-6:
+        return (before + after) / 2
+    # Keys are exhausted between these neighbours: space everything out again
+    await _renumber(project_id, [d["_id"] async for d in coll.find({"project_id": project_id}, {"_id": 1}).sort([("order", 1), ("_id", 1)])])
+    return (index - 0.5) * ORDER_GAP
+
+async def _renumber(project_id: str, ids: List[ObjectId]) -> None:
+    if ids:
+        db = await get_db()
+        await db[SLIDE_COLLECTION].bulk_write([UpdateOne({"_id": _id, "project_id": project_id}, {"$set": {"order": i * ORDER_GAP}}) for i, _id in enumerate(ids)], ordered=False)
+
+async def insert_slide(project_id: str, owner_id: str, version: int, slide: dict, index: Optional[int] = None) -> Tuple[int, str]:
+    slide = {**slide, "id": new_slide_id()}
+    each = {"$each": [slide]}
+    if index is not None:
+        each["$position"] = index
+    new_version = await _apply(project_id, owner_id, version, {"$push": {"slides": each}})
+    if new_version is not None:
+        return new_version, slide["id"]
+    new_version = await _claim(project_id, owner_id, version, count_delta=1)
+    db = await get_db()
+    count = await db[SLIDE_COLLECTION].count_documents({"project_id": project_id})
+    doc = {k: v for k, v in slide.items() if k != "id"}
+    doc.update(_id=ObjectId(slide["id"]), project_id=project_id, order=await _order_at(project_id, index, count))
+    await db[SLIDE_COLLECTION].insert_one(doc)
+    return new_version, slide["id"]
+
+async def delete_slide(project_id: str, owner_id: str, slide_id: str, version: int) -> int:
+    new_version = await _apply(project_id, owner_id, version, {"$pull": {"slides": {"id": slide_id}}}, {"slides.id": slide_id}, slide_id)
+    if new_version is not None:
+        return new_version
+    db = await get_db()
+    if not await db[SLIDE_COLLECTION].count_documents(_slide_filter(project_id, slide_id), limit=1):
+        raise HTTPException(status_code=404, detail="Slide not found")
+    new_version = await _claim(project_id, owner_id, version, count_delta=-1)
+    await db[SLIDE_COLLECTION].delete_one(_slide_filter(project_id, slide_id))
+    return new_version
+
+async def reorder_slides(project_id: str, owner_id: str, version: int, order: List[str]) -> int:
+    if len(set(order)) != len(order):
+        raise HTTPException(status_code=400, detail="Slide order must list every slide exactly once")
+    # Only ids travel; the server rebuilds the array in the requested order.
+    # $literal keeps client ids starting with '$' from being read as field paths.
+    pipeline = [{"$set": {
+        "slides": {"$map": {"input": {"$literal": order}, "as": "sid", "in": {"$arrayElemAt": [
+            {"$filter": {"input": "$slides", "cond": {"$eq": ["$$this.id", "$$sid"]}}}, 0]}}},
+        "updated_at": datetime.utcnow(),
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+    }}]
+    extra = {"slides": {"$size": len(order)}}
+    if order:
+        extra["slides.id"] = {"$all": order}
+    new_version = await _apply(project_id, owner_id, version, pipeline, extra)
+    if new_version is not None:
+        return new_version
+    db = await get_db()
+    current = [d["_id"] async for d in db[SLIDE_COLLECTION].find({"project_id": project_id}, {"_id": 1})]
+    if {str(i) for i in current} != set(order):
+        raise HTTPException(status_code=400, detail="Slide order must list every slide exactly once")
+    new_version = await _claim(project_id, owner_id, version)
+    await _renumber(project_id, [to_object_id(sid) for sid in order])
+    return new_version
+
+# Collection-mode storage and reads
+
+def slide_documents(project_id: str, slides: List[dict]) -> List[dict]:
+    # Slides keep the ids fresh_slide_ids gave them
+    return [
+        {**{k: v for k, v in s.items() if k != "id"}, "_id": ObjectId(s["id"]), "project_id": project_id, "order": i * ORDER_GAP}
+        for i, s in enumerate(slides)
+    ]
+
+async def store_slides(project_id: str, slides: List[dict]) -> None:
+    if slides:
+        db = await get_db()
+        await db[SLIDE_COLLECTION].insert_many(slide_documents(project_id, slides))
+
+async def drop_slides(project_id: str) -> None:
+    db = await get_db()
+    await db[SLIDE_COLLECTION].delete_many({"project_id": project_id})
+
+async def attach_preview(proj: dict, count: int = SLIDE_PREVIEW_COUNT) -> dict:
+    # Reads return the first few slides and the total; the rest are paged
+    if not is_external(proj):
+        proj.setdefault("slide_count", len(proj.get("slides") or []))
+        return proj
+    db = await get_db()
+    docs = await db[SLIDE_COLLECTION].find({"project_id": proj["id"]}).sort([("order", 1), ("_id", 1)]).limit(count).to_list(count)
+    proj["slides"] = [_public_slide(d) for d in docs]
+    proj.setdefault("slide_count", len(proj["slides"]))
+    return proj
+
+async def slide_page(proj: dict, limit: int, cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+    if is_external(proj):
+        docs, next_cursor = await get_page(SLIDE_COLLECTION, {"project_id": proj["id"]}, limit, cursor, "order", direction=1)
+        for d in docs:
+            d.pop("project_id", None)
+            d.pop("order", None)
+        return docs, next_cursor
+    # Embedded: the cursor is the offset of the next slide
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    slides = proj.get("slides") or []
+    page = slides[offset:offset + limit]
+    return page, str(offset + limit) if offset + limit < len(slides) else None
+
+async def iter_slides(project_id: str, batch_size: int = SLIDE_CURSOR_BATCH) -> AsyncIterator[dict]:
+    db = await get_db()
+    cursor = db[SLIDE_COLLECTION].find({"project_id": project_id}).sort([("order", 1), ("_id", 1)]).batch_size(batch_size)
+    async for doc in cursor:
+        yield _public_slide(doc)
+
+async def slides_by_project(project_ids: List[str]) -> Dict[str, List[dict]]:
+    # Ordered slides of several collection-mode projects in one query
+    db = await get_db()
+    grouped: Dict[str, List[dict]] = {pid: [] for pid in project_ids}
+    cursor = db[SLIDE_COLLECTION].find({"project_id": {"$in": project_ids}}).sort([("project_id", 1), ("order", 1), ("_id", 1)])
+    async for doc in cursor:
+        grouped[doc["project_id"]].append(_public_slide(doc))
+    return grouped
+
+def slide_source(proj: dict) -> Union[List[dict], AsyncIterator[dict]]:
+    # What exports render: a cursor for collection-mode projects, so the
+    # slides are never all in memory at once; a blank slide if there are none
+    if is_external(proj) and proj.get("slide_count"):
+        return iter_slides(proj["id"])
+    return proj.get("slides") or [{}]
+
+def slide_total(proj: dict) -> int:
+    if is_external(proj):
+        return proj.get("slide_count") or 1
+    return len(proj.get("slides") or []) or 1
+
+async def slide_list(proj: dict) -> List[dict]:
+    source = slide_source(proj)
+    return source if isinstance(source, list) else [s async for s in source]
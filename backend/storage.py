@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+STORAGE_IO_WORKERS = int(os.getenv("STORAGE_IO_WORKERS", "8"))
+
+@dataclass
+class StoredObject:
+    key: str
+    url: str
+    size: int
+    sha256: str
+
+@dataclass
+class SpooledUpload:
+    handle: Any
+    size: int
+    sha256: str
+
+def content_key(sha256: str) -> str:
+    # Content-addressed layout: identical bytes always map to the same key
+    return f"{sha256[:2]}/{sha256}"
+
+class StorageBackend(ABC):
+    """Blob store for uploaded media. Writes go to a temporary handle that is
+    either committed under a final key or aborted."""
+
+    @abstractmethod
+    async def create_temp(self) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def write(self, handle: Any, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def commit(self, handle: Any, key: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def abort(self, handle: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str = MEDIA_ROOT, workers: int = STORAGE_IO_WORKERS):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage")
+        os.makedirs(os.path.join(root, ".tmp"), exist_ok=True)
+
+    async def _io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def url(self, key: str) -> str:
+        return self.path(key)
+
+    async def create_temp(self) -> Any:
+        return await self._io(open, os.path.join(self.root, ".tmp", secrets.token_hex(16)), "wb")
+
+    async def write(self, handle: Any, chunk: bytes) -> None:
+        await self._io(handle.write, chunk)
+
+    async def commit(self, handle: Any, key: str) -> str:
+        def _commit():
+            handle.close()
+            dest = self.path(key)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(handle.name, dest)
+            return self.url(key)
+        return await self._io(_commit)
+
+    async def abort(self, handle: Any) -> None:
+        def _abort():
+            handle.close()
+            if os.path.exists(handle.name):
+                os.remove(handle.name)
+        await self._io(_abort)
+
+    async def delete(self, key: str) -> None:
+        def _delete():
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+        await self._io(_delete)
+
+class Spool:
+    """Hashes an upload and writes it to a temp handle as its bytes arrive.
+    Writes are coalesced to chunk_size, so peak memory is about one chunk
+    regardless of file size. The caller decides, once the hash is known,
+    whether to commit the handle or abort it."""
+
+    def __init__(self, backend: StorageBackend, handle: Any, max_bytes: int, chunk_size: int):
+        self.backend = backend
+        self.handle = handle
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_bytes} bytes")
+        self._digest.update(data)
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.chunk_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._pending:
+            data = b"".join(self._pending)
+            self._pending, self._pending_bytes = [], 0
+            await self.backend.write(self.handle, data)
+
+    async def finish(self) -> SpooledUpload:
+        await self._flush()
+        return SpooledUpload(handle=self.handle, size=self.size, sha256=self._digest.hexdigest())
+
+    async def abort(self) -> None:
+        await self.backend.abort(self.handle)
+
+async def open_spool(backend: StorageBackend, max_bytes: int = MAX_UPLOAD_BYTES, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Spool:
+    return Spool(backend, await backend.create_temp(), max_bytes, chunk_size)
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = LocalStorage()
+    return _storage
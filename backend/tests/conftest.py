@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests run from the backend directory like the app: python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+import importer
+from importer import JsonArrayScanner, _Unparsable, iter_json_array, iter_ndjson
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+async def then_fail(*chunks: bytes):
+    # The parser must stop on its own before asking for more
+    for chunk in chunks:
+        yield chunk
+    raise AssertionError("read past the error")
+
+def collect(items):
+    async def run():
+        out = []
+        try:
+            async for item in items:
+                out.append(item)
+        except ValueError as e:
+            return out, str(e)
+        return out, None
+    return asyncio.run(run())
+
+ARRAY = '[1.5e3, -22, true, null, "café ☃", {"a": [1, {"b": "]"}], "c": "\\u00e9"}, 0, [] ]'
+
+# --- NDJSON -----------------------------------------------------------------
+
+def test_ndjson_lines_across_any_chunking():
+    body = b'{"a": 1}\n\n{"b": "\xc3\xa9"}\r\n[2]\n{"c": 3}'
+    for size in range(1, len(body) + 1):
+        assert collect(iter_ndjson(chunked(body, size))) == ([{"a": 1}, {"b": "é"}, [2], {"c": 3}], None)
+
+def test_ndjson_bad_line_fails_only_itself():
+    items, error = collect(iter_ndjson(chunked(b'{"a": 1}\n{bad\n\xff\xfe\n{"b": 2}\n', 4)))
+    assert error is None
+    assert items[0] == {"a": 1} and items[3] == {"b": 2}
+    assert isinstance(items[1], _Unparsable) and isinstance(items[2], _Unparsable)
+
+def test_ndjson_line_cap(monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_MAX_LINE_BYTES", 16)
+    items, error = collect(iter_ndjson(then_fail(b'{"a": 1}\n', b'{"long": "', b'x' * 20)))
+    assert items == [{"a": 1}]
+    assert "exceeds 16 bytes" in error
+
+# --- JSON array -------------------------------------------------------------
+
+def test_array_across_any_chunking():
+    body = ARRAY.encode()
+    expected = json.loads(ARRAY)
+    for size in range(1, len(body) + 1):
+        assert collect(iter_json_array(chunked(body, size))) == (expected, None)
+
+@pytest.mark.parametrize("body", ["[]", "  [ ]\n", "\n[\n]\n"])
+def test_array_empty(body):
+    assert collect(iter_json_array(chunked(body.encode(), 1))) == ([], None)
+
+@pytest.mark.parametrize("body, items, message", [
+    ("[1 2]", [1], "Expected ',' or ']'"),
+    ("[1,,2]", [1], "Expected an array element"),
+    ("[,1]", [], "Expected an array element"),
+    ("[1,]", [1], "Expected an array element"),
+    ("[1]xyz", [1], "Unexpected data after the JSON array"),
+    ("[1] [2]", [1], "Unexpected data after the JSON array"),
+    ('{"a": 1}', [], "Expected a JSON array"),
+    ('[1, {"a" 2}, 3]', [1], "Invalid JSON in array element"),
+    ("[1, tru]", [1], "Invalid JSON in array element"),
+    ('[1, "\\u12x4"]', [1], "Invalid JSON in array element"),
+])
+def test_array_invalid(body, items, message):
+    for size in (1, 3, len(body)):
+        got, error = collect(iter_json_array(chunked(body.encode(), size)))
+        assert got == items
+        assert error is not None and message in error, (size, error)
+
+@pytest.mark.parametrize("body, items", [
+    ("", []),
+    ("[", []),
+    ("[1, 2", [1, 2]),
+    ("[1, 2,", [1, 2]),
+    ('[1, {"a": "b', [1]),
+    ("[1, tr", [1]),
+    ('[1, "\\u00', [1]),
+])
+def test_array_truncated(body, items):
+    got, error = collect(iter_json_array(chunked(body.encode(), 2)))
+    assert (got, error) == (items, "Truncated JSON array")
+
+def test_array_syntax_error_is_reported_without_reading_on():
+    items, error = collect(iter_json_array(then_fail(b'[{"a": 1}, {"b" 2}, ', b"3]")))
+    assert items == [{"a": 1}]
+    assert "Invalid JSON in array element" in error
+
+def test_array_invalid_utf8_stops_at_the_bad_chunk():
+    items, error = collect(iter_json_array(then_fail(b'[1, "ok", ', b'"\xff", ', b"2]")))
+    assert items == [1, "ok"]
+    assert "not valid UTF-8" in error
+
+def test_array_truncated_utf8_at_end():
+    items, error = collect(iter_json_array(chunked(b'[1, "\xe2\x98', 3)))
+    assert items == [1]
+    assert "not valid UTF-8" in error
+
+def test_array_element_cap(monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_MAX_LINE_BYTES", 32)
+    items, error = collect(iter_json_array(then_fail(b'[1, "', b"x" * 40)))
+    assert items == [1]
+    assert "exceeds 32 bytes" in error
+
+def test_scanner_keeps_only_the_open_element():
+    scanner = JsonArrayScanner()
+    assert list(scanner.feed('[{"a": 1}, {"b": ')) == [{"a": 1}]
+    assert scanner.buf == '{"b": '
+    assert list(scanner.feed("2}, 12")) == [{"b": 2}]
+    assert list(scanner.feed("34]", final=True)) == [1234]
+
+@pytest.mark.parametrize("kind", [[], {}, 3, "folder"])
+def test_bad_kind_fails_only_its_item(kind):
+    docs, errors = importer._validate_batch([(0, {"kind": kind, "title": "a"}), (1, {"title": "b"})], "u1")
+    assert [e["index"] for e in errors] == [0]
+    assert errors[0]["error"].startswith("Unknown kind")
+    assert [i for i, _ in docs["project"]] == [1]
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import uploads
+from storage import LocalStorage
+from uploads import receive_upload
+
+BOUNDARY = "xyzBOUNDARYxyz"
+
+class FakeRequest:
+    # receive_upload only reads the headers and the body stream
+    def __init__(self, body: bytes, chunk: int = 7, content_type: str = f"multipart/form-data; boundary={BOUNDARY}", length: bool = True):
+        self.headers = {"content-type": content_type}
+        if length:
+            self.headers["content-length"] = str(len(body))
+        self._body = body
+        self._chunk = chunk
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk):
+            yield self._body[i:i + self._chunk]
+
+def form(*parts) -> bytes:
+    out = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        out += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if filename:
+            out += b"Content-Type: image/png\r\n"
+        out += b"\r\n" + value + b"\r\n"
+    return out + f"--{BOUNDARY}--\r\n".encode()
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(root=str(tmp_path))
+
+def temp_files(storage):
+    return os.listdir(os.path.join(storage.root, ".tmp"))
+
+def receive(request, storage, **kwargs):
+    return asyncio.run(receive_upload(request, storage, **kwargs))
+
+def status(request, storage, **kwargs):
+    with pytest.raises(HTTPException) as e:
+        receive(request, storage, **kwargs)
+    return e.value.status_code, e.value.detail
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1 << 20])
+def test_file_and_fields_across_any_chunking(storage, chunk):
+    data = bytes(range(256)) * 40
+    got = receive(FakeRequest(form(("project_id", b"p1", None), ("file", data, "a.png"), ("title", "é".encode(), None)), chunk), storage)
+    assert got.fields == {"project_id": "p1", "title": "é"}
+    assert (got.filename, got.content_type) == ("a.png", "image/png")
+    assert (got.spooled.size, got.spooled.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    got.spooled.handle.close()
+    with open(got.spooled.handle.name, "rb") as f:
+        assert f.read() == data
+
+def test_malformed_body_is_a_bad_request(storage):
+    code, detail = status(FakeRequest(b"garbage"), storage)
+    assert code == 400 and detail.startswith("Malformed multipart body")
+
+def test_malformed_after_file_started_drops_the_spool(storage):
+    # The next part's headers are invalid, after the file bytes were spooled
+    body = form(("file", b"x" * 100, "a.png"))[:-len(BOUNDARY) - 6] + f"--{BOUNDARY}\r\nbad header\r\n\r\n".encode()
+    code, detail = status(FakeRequest(body), storage)
+    assert code == 400 and detail.startswith("Malformed multipart body")
+    assert temp_files(storage) == []
+
+def test_truncated_body(storage):
+    body = form(("file", b"x" * 100, "a.png"))
+    assert status(FakeRequest(body[:-10]), storage) == (400, "Incomplete multipart body")
+    assert temp_files(storage) == []
+
+def test_missing_file(storage):
+    assert status(FakeRequest(form(("project_id", b"p1", None))), storage) == (400, "Missing file field 'file'")
+
+def test_only_one_file(storage):
+    body = form(("file", b"a", "a.png"), ("file", b"b", "b.png"))
+    assert status(FakeRequest(body), storage)[0] == 400
+    assert temp_files(storage) == []
+
+def test_not_multipart(storage):
+    assert status(FakeRequest(b"{}", content_type="application/json"), storage)[0] == 400
+
+def test_declared_length_over_limit_is_refused_up_front(storage):
+    body = form(("file", b"x" * 10, "a.png"))
+    assert status(FakeRequest(body), storage, max_bytes=-uploads.MULTIPART_OVERHEAD_BYTES)[0] == 413
+    assert temp_files(storage) == []
+
+def test_streamed_size_over_limit(storage):
+    body = form(("file", b"x" * 1000, "a.png"))
+    assert status(FakeRequest(body, length=False), storage, max_bytes=999)[0] == 413
+    assert temp_files(storage) == []
+
+def test_field_cap(storage, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_FIELD_BYTES", 8)
+    assert status(FakeRequest(form(("title", b"x" * 9, None), ("file", b"a", "a.png"))), storage)[0] == 400
@@ -0,0 +1,140 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+from storage import MAX_UPLOAD_BYTES, Spool, SpooledUpload, StorageBackend, open_spool
+
+# Reads multipart/form-data uploads straight off the request stream. Starlette's
+# form parsing would first copy the whole body into a temp file, so the size
+# limit and the single write into storage could only happen afterwards. Here
+# the file part is hashed and written to the storage temp handle as it
+# arrives; the other (small) form fields are kept in memory.
+
+# Allowance for part headers, boundaries and text fields next to the file
+MULTIPART_OVERHEAD_BYTES = int(os.getenv("MULTIPART_OVERHEAD_BYTES", str(64 * 1024)))
+MAX_FIELD_BYTES = 16 * 1024
+
+@dataclass
+class ReceivedUpload:
+    fields: Dict[str, str]
+    filename: Optional[str]
+    content_type: Optional[str]
+    spooled: SpooledUpload
+
+@dataclass
+class _Part:
+    headers: Dict[bytes, bytes] = field(default_factory=dict)
+    name: str = ""
+    filename: Optional[str] = None
+    is_file: bool = False
+    data: bytearray = field(default_factory=bytearray)
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=detail)
+
+class _FormReader:
+    # Parser callbacks are synchronous; file bytes are queued for the caller
+    # to write after each parser.write()
+
+    def __init__(self, file_field: str):
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.file_part: Optional[_Part] = None
+        self.file_data: List[bytes] = []
+        self.complete = False
+        self._part = _Part()
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_end": self.on_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if len(self._part.headers) > 16:
+            raise _bad_request("Too many part headers")
+        self._part.headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        disposition, options = parse_options_header(self._part.headers.get(b"content-disposition", b""))
+        if disposition != b"form-data" or b"name" not in options:
+            raise _bad_request("Multipart part without a form-data name")
+        part = self._part
+        part.name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options:
+            if part.name != self.file_field or self.file_part is not None:
+                raise _bad_request(f"Only one file, in the '{self.file_field}' field, is accepted")
+            part.filename = options[b"filename"].decode("utf-8", "replace")
+            part.is_file = True
+            self.file_part = part
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part.is_file:
+            self.file_data.append(data[start:end])
+            return
+        self._part.data += data[start:end]
+        if len(self._part.data) > MAX_FIELD_BYTES:
+            raise _bad_request(f"Form field '{self._part.name}' exceeds {MAX_FIELD_BYTES} bytes")
+
+    def on_part_end(self) -> None:
+        if not self._part.is_file:
+            self.fields[self._part.name] = self._part.data.decode("utf-8", "replace")
+
+    def on_end(self) -> None:
+        self.complete = True
+
+async def receive_upload(request: Request, backend: StorageBackend, file_field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES) -> ReceivedUpload:
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise _bad_request("Expected a multipart/form-data body")
+    # A declared length over the limit is refused before any of the body is read
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    reader = _FormReader(file_field)
+    parser = MultipartParser(params[b"boundary"], reader.callbacks())
+    spool: Optional[Spool] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if reader.file_part is not None and spool is None:
+                spool = await open_spool(backend, max_bytes)
+            for data in reader.file_data:
+                await spool.write(data)
+            reader.file_data.clear()
+        parser.finalize()
+        if not reader.complete:
+            raise _bad_request("Incomplete multipart body")
+        if spool is None:
+            raise _bad_request(f"Missing file field '{file_field}'")
+        spooled = await spool.finish()
+    except BaseException as e:
+        if spool is not None:
+            await spool.abort()
+        if isinstance(e, MultipartParseError):
+            raise _bad_request(f"Malformed multipart body: {e}") from e
+        raise
+    part = reader.file_part
+    return ReceivedUpload(fields=reader.fields, filename=part.filename, content_type=part.headers.get(b"content-type", b"").decode("latin-1") or None, spooled=spooled)
@@ -0,0 +1,20 @@
+import io
+from typing import List
+
+class ZipSink(io.RawIOBase):
+    # Unseekable sink: ZipFile falls back to data descriptors and every write
+    # can be handed to the client as soon as it is produced.
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
@@ -1,13 +1,15 @@
 """
 Database Helper Functions
 
-MongoDB helper functions ready to use in your backend code.
-Import and use these functions in your API endpoints for database operations.
+Async MongoDB helper functions ready to use in your backend code.
+Await them from `async def` endpoints; database round trips then never
+block the event loop. Scripts and other synchronous code can use the same
+functions from database_sync.
 """
 
-from pymongo import MongoClient
 from datetime import datetime, timezone
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Union
 from pydantic import BaseModel
@@ -15,41 +17,63 @@ from pydantic import BaseModel
 # Load environment variables from .env file
 load_dotenv()
 
-_client = None
+# The Mongo client, its connection pool and the command metrics are shared
+# with the backend app. Appended, not prepended, so backend modules never
+# shadow the ones in this directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from mongo import get_client
+
 db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+    db = get_client()[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+def _require_db():
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    return db
 
+def _to_dict(data: Union[BaseModel, dict]) -> dict:
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
-    else:
-        data_dict = data.copy()
+        return data.model_dump()
+    return data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
+# Document building is shared with the sync facade so both write the same shape
+def new_document(data: Union[BaseModel, dict]) -> dict:
+    data_dict = _to_dict(data)
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+    return data_dict
+
+def update_spec(data: Union[BaseModel, dict]) -> dict:
+    data_dict = _to_dict(data)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return {"$set": data_dict}
 
-    result = db[collection_name].insert_one(data_dict)
+# Helper functions for common database operations
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    result = await _require_db()[collection_name].insert_one(new_document(data))
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = _require_db()[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+    return await cursor.to_list(length=None)
+
+async def update_document(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict]):
+    """Set fields on the first matching document; True if one matched"""
+    result = await _require_db()[collection_name].update_one(filter_dict, update_spec(data))
+    return result.matched_count > 0
+
+async def delete_document(collection_name: str, filter_dict: dict):
+    """Delete the first matching document; True if one was deleted"""
+    result = await _require_db()[collection_name].delete_one(filter_dict)
+    return result.deleted_count > 0
@@ -0,0 +1,43 @@
+"""
+Synchronous Database Helpers
+
+The functions from database.py for scripts and other code that does not
+run on an event loop. Same names, arguments and results. They go through the
+PyMongo client underneath the shared async client, so they use the same
+connection pool. Don't call these from async endpoints: they block the loop.
+"""
+
+from typing import Union
+from pydantic import BaseModel
+
+import database
+from database import new_document, update_spec
+
+db = database.db.delegate if database.db is not None else None
+
+def _require_db():
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    return db
+
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    result = _require_db()[collection_name].insert_one(new_document(data))
+    return str(result.inserted_id)
+
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+    """Get documents from collection"""
+    cursor = _require_db()[collection_name].find(filter_dict or {})
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+def update_document(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict]):
+    """Set fields on the first matching document; True if one matched"""
+    result = _require_db()[collection_name].update_one(filter_dict, update_spec(data))
+    return result.matched_count > 0
+
+def delete_document(collection_name: str, filter_dict: dict):
+    """Delete the first matching document; True if one was deleted"""
+    result = _require_db()[collection_name].delete_one(filter_dict)
+    return result.deleted_count > 0
@@ -21,7 +21,7 @@ def hello():
     return {"message": "Hello from the backend API!"}
 
 @app.get("/test")
-def test_database():
+async def test_database():
     """Test endpoint to check if database is available and accessible"""
     response = {
         "backend": "✅ Running",
@@ -44,7 +44,7 @@ def test_database():
             
             # Try to list collections to verify connectivity
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]  # Show first 10 collections
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
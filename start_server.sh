@@ -1,19 +1,42 @@
 #!/bin/bash
 echo "Starting FastAPI backend server..."
 
-# Find and kill MainThread processes
-PIDS=$(ps | grep uvicorn | grep -v grep | awk '{print $1}')
+# Stop a previous server; SIGTERM lets it drain in-flight exports first
+PIDS=$(ps ax | grep -E "uvicorn|serve.py" | grep -v grep | awk '{print $1}')
 if [ ! -z "$PIDS" ]; then
-  echo "Killing uvicorn processes: $PIDS"
+  echo "Stopping server processes: $PIDS"
   for pid in $PIDS; do
     kill $pid 2>/dev/null || true
   done
-  sleep 2
+  # Wait up to 90s for every one of them to exit
+  for _ in $(seq 1 90); do
+    ALIVE=""
+    for pid in $PIDS; do
+      kill -0 $pid 2>/dev/null && ALIVE="$ALIVE $pid"
+    done
+    [ -z "$ALIVE" ] && break
+    sleep 1
+  done
 fi
 
 mkdir -p logs
-echo "Installing dependencies..."
-pip install -r requirements.txt
-echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+if [ "$APP" = "backend" ]; then
+  # The storyboard API in backend/ (its own requirements, pydantic 1) under
+  # the pre-forking multi-worker launcher; DEV=1 runs it with auto-reload.
+  # Needs JWT_SECRET_KEY (and DATABASE_URL / DATABASE_NAME) in the environment.
+  cd backend
+  echo "Installing dependencies..."
+  pip install -r requirements.txt
+  echo "Starting FastAPI server..."
+  if [ "$DEV" = "1" ]; then
+    nohup uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000} --reload > ../logs/server.log 2>&1 &
+  else
+    nohup python serve.py > ../logs/server.log 2>&1 &
+  fi
+else
+  echo "Installing dependencies..."
+  pip install -r requirements.txt
+  echo "Starting FastAPI server..."
+  nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1
+fi
 echo "Server started in background"